@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import datetime
+import resource
+import platform
+import contextlib
+import multiprocessing
+
+# Бенчмарк звітів, пошуку, списку та експорту на локальному PostgreSQL.
+# Працює з окремою базою (BENCH_DB_NAME), бо перед кожним розміром дані перезаписуються.
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+CASES = ["report_max_min_by_category", "report_extreme_in_period", "report_average_daily",
+         "search_expenses", "list_expenses", "export_csv"]
+
+# Параметри генератора, під які підібрано період звітів
+BENCH_SEED = 1
+BENCH_CATEGORIES = 50
+BENCH_START = "2024-01-01"
+BENCH_DAYS = 730
+PERIOD = ("2025-12-01", "2025-12-30")
+EXPORT_PATH = "export/bench_report.csv"
+
+
+def percentile(values, pct):
+    # Метод найближчого рангу
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _case_function(name, dataset_rows):
+    # Повертає функцію, яка виконує сценарій і повертає кількість оброблених рядків
+    import main
+    import repository
+    from exporter import export_expenses
+
+    def paged(fetch):
+        rows, _ = fetch()
+        return sum(1 for _ in rows or [])
+
+    return {
+        "report_max_min_by_category": lambda: (main.report_max_min_by_category(), dataset_rows)[1],
+        "report_extreme_in_period": lambda: (main.report_extreme_in_period(*PERIOD), dataset_rows)[1],
+        "report_average_daily": lambda: (main.report_average_daily(*PERIOD), dataset_rows)[1],
+        "search_expenses": lambda: paged(lambda: repository.search_page("а", "", *PERIOD)),
+        "list_expenses": lambda: paged(repository.expenses_page),
+        "export_csv": lambda: export_expenses(EXPORT_PATH)[1] or dataset_rows,
+    }[name]
+
+
+def _run_case(name, dataset_rows, repeat, warmup, queue):
+    # Виконується в окремому процесі, щоб пікове RSS стосувалося лише одного сценарію
+    func = _case_function(name, dataset_rows)
+    latencies = []
+    rows = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(warmup):
+            func()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = func()
+            latencies.append(time.perf_counter() - started)
+
+    p50 = percentile(latencies, 50)
+    queue.put({
+        "runs": repeat,
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "rows": rows,
+        "rows_per_sec": round(rows / p50, 1) if p50 > 0 else None,
+        # На Linux ru_maxrss у кілобайтах
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+
+
+def run_case(name, dataset_rows, repeat, warmup):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case, args=(name, dataset_rows, repeat, warmup, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def load_dataset(rows):
+    import generator
+    started = time.perf_counter()
+    generator.seed(BENCH_CATEGORIES, rows, BENCH_SEED, BENCH_START, BENCH_DAYS, replace=True)
+    return round(time.perf_counter() - started, 1)
+
+
+def compare(baseline, current, threshold):
+    # Повертає список регресій: p50/p95 гірші за базові більш ніж на threshold (частка)
+    regressions = []
+    for size, cases in current["results"].items():
+        for case, result in cases.items():
+            base = baseline.get("results", {}).get(size, {}).get(case)
+            if not base:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                if base[metric] and result[metric] > base[metric] * (1 + threshold):
+                    regressions.append((size, case, metric, base[metric], result[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк звітів і пошуку")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="набори даних: " + ", ".join(SIZES))
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--db", default=os.getenv("BENCH_DB_NAME", "expenses_bench"))
+    parser.add_argument("--no-load", action="store_true", help="не перезавантажувати дані (лише один розмір)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="JSON попереднього запуску для порівняння")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустиме погіршення, частка")
+    args = parser.parse_args(argv)
+
+    # Дочірні процеси читають DB_NAME з оточення, load_dotenv його не перезапише
+    os.environ["DB_NAME"] = args.db
+    # Вимірюємо самі запити, а не повторні влучання в кеш звітів
+    os.environ.setdefault("REPORT_CACHE_SIZE", "0")
+    from migrations import init_db
+    if not init_db():
+        return 2
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [s for s in sizes if s not in SIZES] + [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"Невідомі параметри: {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in sizes:
+        if not args.no_load:
+            print(f"[{size}] Завантаження {SIZES[size]} рядків...", flush=True)
+            report["meta"][f"load_seconds_{size}"] = load_dataset(SIZES[size])
+        report["results"][size] = {}
+        for case in cases:
+            result = run_case(case, SIZES[size], args.repeat, args.warmup)
+            report["results"][size][case] = result
+            print(f"[{size}] {case:<28} p50={result['p50_ms']:>10.2f} ms  p95={result['p95_ms']:>10.2f} ms  "
+                  f"rows/s={result['rows_per_sec']}  rss={result['peak_rss_kb']} KB", flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результати збережено в {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for size, case, metric, old, new in regressions:
+            print(f"РЕГРЕСІЯ [{size}] {case} {metric}: {old} -> {new}")
+        if regressions:
+            return 1
+        print("Регресій не виявлено.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+import functools
+from collections import OrderedDict
+from database import execute_query, read_session
+
+# Час життя кешу категорій у секундах; 0 — без обмеження (один процес).
+# Для кількох процесів варто задати TTL, бо інвалідація працює лише в межах процесу.
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", "0"))
+# Скільки результатів звітів тримати в пам'яті; 0 — кеш звітів вимкнено
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "128"))
+
+# Лічильник версій даних: тригери рівня оператора збільшують версію таблиці в тій самій
+# транзакції, що й зміна, тож нова версія стає видимою разом із новими даними
+DATA_VERSIONS_MIGRATION_SQL = """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    );
+    INSERT INTO data_versions (table_name) VALUES ('expenses'), ('categories')
+        ON CONFLICT DO NOTHING;
+
+    CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_expenses_data_version ON expenses;
+    CREATE TRIGGER trg_expenses_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON expenses
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+    DROP TRIGGER IF EXISTS trg_categories_data_version ON categories;
+    CREATE TRIGGER trg_categories_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+"""
+
+
+class CategoryCache:
+    # Кеш активних категорій за id та за назвою, скидається після кожної зміни категорій
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._by_id = None
+        self._by_name = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _expired(self):
+        return self._by_id is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._expired():
+                return self._by_id, self._by_name
+            rows = execute_query("SELECT id, name FROM categories WHERE is_deleted=FALSE ORDER BY id",
+                                 fetch=True, prepared=True)
+            if rows is None:
+                # Помилку БД вже показано; порожній результат не кешуємо
+                return {}, {}
+            self._by_id = dict(rows)
+            self._by_name = {name: cat_id for cat_id, name in rows}
+            self._loaded_at = time.monotonic()
+            return self._by_id, self._by_name
+
+    def all(self):
+        # Список (id, назва), відсортований за id
+        by_id, _ = self._ensure_loaded()
+        return list(by_id.items())
+
+    def get(self, cat_id):
+        by_id, _ = self._ensure_loaded()
+        return by_id.get(int(cat_id))
+
+    def get_by_name(self, name):
+        _, by_name = self._ensure_loaded()
+        return by_name.get(name)
+
+    def exists(self, cat_id):
+        return self.get(cat_id) is not None
+
+    def invalidate(self):
+        with self._lock:
+            self._by_id = None
+            self._by_name = None
+
+
+class ReportCache:
+    # LRU-кеш результатів звітів за (назва, параметри). Запис дійсний, доки не змінилась
+    # жодна версія в data_versions, тож повторний звіт коштує один запит перевірки версій.
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def versions(self):
+        rows = execute_query("SELECT table_name, version FROM data_versions ORDER BY table_name",
+                             fetch=True, prepared=True)
+        return tuple(rows) if rows is not None else None
+
+    def get_or_compute(self, key, compute):
+        if not self.max_size:
+            return compute()
+        # Версії читаються до обчислення: якщо дані зміняться під час звіту,
+        # запис збережеться зі старою версією і наступного разу просто перерахується.
+        # Обидва читання йдуть на одне з'єднання (один вузол): з репліками звіт з відсталої
+        # репліки інакше міг би закешуватися під свіжішими версіями з іншого вузла
+        with read_session():
+            versions = self.versions()
+            if versions is not None:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] == versions:
+                        self._entries.move_to_end(key)
+                        self.stats["hits"] += 1
+                        return entry[1]
+                    self.stats["misses"] += 1
+                result = compute()
+        if versions is None:
+            return compute()
+        if result is None:
+            # Помилку БД не кешуємо
+            return result
+        with self._lock:
+            self._entries[key] = (versions, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return result
+
+    def cached(self, func):
+        # Декоратор для функцій звітів; аргументи стають частиною ключа
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return self.get_or_compute(key, lambda: func(*args, **kwargs))
+        return wrapper
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+categories = CategoryCache(CATEGORY_CACHE_TTL)
+reports = ReportCache(REPORT_CACHE_SIZE)
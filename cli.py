@@ -0,0 +1,274 @@
+import sys
+import argparse
+import contextlib
+
+# Неінтерактивний інтерфейс для скриптів і cron.
+# Модулі роботи з БД імпортуються лише всередині обробників команд, а синхронізація
+# схеми виконується тільки за командою migrate або прапорцем --sync.
+
+REPORTS = ["total", "by-category", "max-min", "extreme", "avg-daily", "top", "distribution"]
+
+
+def _json_value(value):
+    # Decimal і дати серіалізуємо рядками, щоб не втратити точність сум
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def emit(columns, rows, fmt, out=sys.stdout):
+    if fmt == "csv":
+        import csv
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    else:
+        import json
+        json.dump([{c: _json_value(v) for c, v in zip(columns, row)} for row in rows],
+                  out, ensure_ascii=False)
+        out.write("\n")
+
+
+def _require_period(args):
+    from utils import validate_date
+    if not (args.date_from and args.date_to and validate_date(args.date_from) and validate_date(args.date_to)):
+        raise SystemExit("Потрібні --from і --to у форматі YYYY-MM-DD.")
+
+
+# Звіти, які можна рахувати по колонковому знімку (snapshot.py)
+SNAPSHOT_REPORTS = {"total", "max-min", "extreme", "avg-daily"}
+
+
+def _days_in_period(start, end):
+    import datetime
+    return (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days + 1
+
+
+def cmd_report(args):
+    if args.snapshot:
+        if args.name not in SNAPSHOT_REPORTS:
+            raise SystemExit(f"Звіт '{args.name}' недоступний для знімка.")
+        from snapshot import Snapshot
+        reports = Snapshot(args.snapshot)
+    else:
+        import reports
+    if args.name == "total":
+        return ["currency", "total"], reports.total()
+    if args.name == "by-category":
+        return ["category", "currency", "total"], reports.totals_by_category()
+    if args.name == "max-min":
+        return ["category", "max", "min", "count"], reports.max_min_by_category()
+    if args.name == "top":
+        return ["currency", "category", "total"], reports.top_category()
+    if args.name == "distribution":
+        # Без --from/--to — розподіл за весь час
+        columns = ["category", "currency", "count", "p50", "p90", "p99"]
+        if not (args.date_from or args.date_to):
+            return columns, reports.distribution()
+        _require_period(args)
+        if _days_in_period(args.date_from, args.date_to) <= 0:
+            raise SystemExit("Кінцева дата має бути не раніше за початкову.")
+        return columns, reports.distribution(args.date_from, args.date_to)
+    _require_period(args)
+    if args.name == "extreme":
+        columns = ["kind", "title", "amount", "currency", "date"]
+        result = reports.extreme_in_period(args.date_from, args.date_to)
+        if result is None:
+            return columns, None
+        max_exp, min_exp = result
+        rows = [("max",) + tuple(max_exp), ("min",) + tuple(min_exp)] if max_exp else []
+        return columns, rows
+    if _days_in_period(args.date_from, args.date_to) <= 0:
+        raise SystemExit("Кінцева дата має бути більшою за початкову.")
+    rows = reports.average_daily(args.date_from, args.date_to)
+    return ["currency", "total", "average_daily"], rows
+
+
+def cmd_search(args):
+    import reports
+    text = args.text or args.title or ""
+    after = None
+    if args.after_id is not None:
+        after = (args.after_rank, args.after_id) if text else (args.after_date, args.after_id)
+    rows, has_more = reports.fetch_search_page(text, args.category or "",
+                                               args.date_from or "", args.date_to or "",
+                                               after=after, size=args.limit)
+    if rows and has_more:
+        # Курсор наступної сторінки — у stderr, щоб не псувати машинний вивід
+        last = rows[-1]
+        position = f"--after-rank {last[7]!r}" if text else f"--after-date {last[2]}"
+        print(f"next: {position} --after-id {last[0]}", file=sys.stderr)
+    columns = ["id", "title", "date", "category", "amount", "currency", "description"]
+    if text and rows is not None:
+        rows = [(*row[:7], -row[7]) for row in rows]
+    if text:
+        columns.append("rank")
+    return columns, rows
+
+
+def cmd_export(args):
+    from exporter import export_expenses, export_parallel, EXPORT_PATH, PARALLEL_DIR
+    if args.parallel:
+        path, rows = export_parallel(args.output or PARALLEL_DIR, args.parallel, args.shard_by,
+                                     args.date_from, args.date_to, args.category, args.currency,
+                                     compress=args.gzip)
+        return ["manifest", "rows"], [(path, rows)]
+    path, rows = export_expenses(args.output or EXPORT_PATH, args.date_from, args.date_to,
+                                 args.category, args.currency, compress=args.gzip, mode=args.mode)
+    return ["path", "rows"], [(path, rows)]
+
+
+def cmd_changes(args):
+    import exporter
+    if args.action == "compact":
+        path, rows = exporter.compact_changes(args.dir)
+    else:
+        path, rows = exporter.export_changes(args.dir, compress=args.gzip)
+    return ["path", "rows"], [(path, rows)]
+
+
+def cmd_snapshot(args):
+    from snapshot import refresh
+    appended, total_rows = refresh(args.path, full=args.full)
+    return ["path", "appended", "rows"], [(args.path, appended, total_rows)]
+
+
+def cmd_partitions(args):
+    import partitioning
+    if args.action == "convert":
+        result = partitioning.convert_to_partitioned(args.months_ahead, keep_old=args.keep)
+        rows = [(result["partitions"], result["rows"])] if result else []
+        return ["partitions", "rows"], rows
+    if args.action == "ensure":
+        return ["created"], [(name,) for name in partitioning.ensure_partitions(args.months_ahead)]
+    if not args.before:
+        raise SystemExit("Потрібен --before у форматі YYYY-MM.")
+    archived = partitioning.archive_partitions(args.before, args.dir, keep_table=args.keep)
+    return ["partition", "path"], archived
+
+
+def cmd_compact(args):
+    import compaction
+    if args.action == "restore":
+        result = compaction.restore(args.expense, args.category)
+        return ["expenses", "categories"], [(result["expenses"], result["categories"])]
+    result = compaction.compact(args.retention_days, args.batch_size, vacuum=not args.no_vacuum, full=args.full)
+    columns = ["expenses", "categories", "bytes_before", "bytes_after", "bytes_reclaimed"]
+    return columns, [tuple(result[c] for c in columns)]
+
+
+def cmd_migrate(args):
+    from migrations import migrate
+    applied = migrate()
+    return ["applied_version"], [(v,) for v in applied]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Звіти та експорт без інтерактивного меню")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--sync", action="store_true", help="перевірити/оновити схему перед командою")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def period(p):
+        p.add_argument("--from", dest="date_from")
+        p.add_argument("--to", dest="date_to")
+
+    report = sub.add_parser("report", help="звіти з меню 'Звіти'")
+    report.add_argument("name", choices=REPORTS)
+    period(report)
+    report.add_argument("--snapshot", metavar="DIR", help="рахувати по колонковому знімку замість БД")
+    report.set_defaults(handler=cmd_report)
+
+    search = sub.add_parser("search", help="розширений пошук")
+    search.add_argument("--text", help="слова або частина слова в назві чи описі")
+    search.add_argument("--title", help="синонім --text")
+    search.add_argument("--category")
+    period(search)
+    search.add_argument("--limit", type=int, default=100)
+    search.add_argument("--after-date")
+    search.add_argument("--after-rank", type=float)
+    search.add_argument("--after-id", type=int)
+    search.set_defaults(handler=cmd_search)
+
+    export = sub.add_parser("export", help="експорт у CSV")
+    period(export)
+    export.add_argument("--category")
+    export.add_argument("--currency")
+    export.add_argument("--gzip", action="store_true")
+    export.add_argument("--mode", choices=["copy", "cursor"], default="copy")
+    export.add_argument("--output", help="файл, а для --parallel — каталог шардів")
+    export.add_argument("--parallel", type=int, metavar="N", help="вивантажити N шардів паралельно")
+    export.add_argument("--shard-by", choices=["id", "date"], default="id")
+    export.set_defaults(handler=cmd_export)
+
+    changes = sub.add_parser("changes", help="інкрементальний експорт змін у дельта-файли")
+    changes.add_argument("action", nargs="?", choices=["export", "compact"], default="export")
+    changes.add_argument("--dir", default="export/changes")
+    changes.add_argument("--gzip", action="store_true")
+    changes.set_defaults(handler=cmd_changes)
+
+    snap = sub.add_parser("snapshot", help="створити/дописати колонковий знімок витрат")
+    snap.add_argument("--path", default="snapshot")
+    snap.add_argument("--full", action="store_true", help="перебудувати знімок з нуля")
+    snap.set_defaults(handler=cmd_snapshot)
+
+    parts = sub.add_parser("partitions", help="секціонування expenses за місяцями")
+    parts.add_argument("action", choices=["convert", "ensure", "archive"])
+    parts.add_argument("--months-ahead", type=int, default=3)
+    parts.add_argument("--before", metavar="YYYY-MM", help="архівувати місяці до вказаного (не включно)")
+    parts.add_argument("--dir", default="archive")
+    parts.add_argument("--keep", action="store_true",
+                       help="не видаляти стару таблицю (convert) або від'єднані секції (archive)")
+    parts.set_defaults(handler=cmd_partitions)
+
+    compact = sub.add_parser("compact", help="перенести м'яко видалені рядки в архівні таблиці")
+    compact.add_argument("action", nargs="?", choices=["run", "restore"], default="run")
+    compact.add_argument("--retention-days", type=int, default=30)
+    compact.add_argument("--batch-size", type=int, default=1000)
+    compact.add_argument("--no-vacuum", action="store_true")
+    compact.add_argument("--full", action="store_true", help="VACUUM FULL (блокує таблиці)")
+    compact.add_argument("--expense", type=int, nargs="*", default=[], metavar="ID")
+    compact.add_argument("--category", type=int, nargs="*", default=[], metavar="ID")
+    compact.set_defaults(handler=cmd_compact)
+
+    migrate = sub.add_parser("migrate", help="застосувати міграції схеми")
+    migrate.set_defaults(handler=cmd_migrate)
+    return parser
+
+
+def _check_search_cursor(parser, args):
+    # Курсор пошуку — пара (ранг або дата, id); один лише --after-id нічого б не знайшов
+    if args.after_id is None:
+        return
+    from utils import validate_date
+    if args.text or args.title:
+        if args.after_rank is None:
+            parser.error("--after-id для пошуку за текстом потребує --after-rank.")
+    elif not (args.after_date and validate_date(args.after_date)):
+        parser.error("--after-id потребує --after-date у форматі YYYY-MM-DD.")
+
+
+def run(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "search":
+        _check_search_cursor(parser, args)
+    # Повідомлення модулів (зокрема "[Помилка БД]" з database.execute_query) друкуються через
+    # print; під час команди вони йдуть у stderr, щоб stdout містив лише JSON/CSV
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.sync and args.command != "migrate":
+            from migrations import init_db
+            if not init_db():
+                return 2
+        columns, rows = args.handler(args)
+    if rows is None:
+        # Помилку БД вже виведено у stderr
+        return 1
+    emit(columns, rows, args.format, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,217 @@
+import os
+import time
+from psycopg2 import errors, sql
+from database import connection, transaction, plain_columns
+
+# Компакція: м'яко видалені витрати й категорії, старші за вікно зберігання,
+# переносяться в архівні таблиці невеликими транзакціями, щоб не тримати довгих блокувань.
+RETENTION_DAYS = int(os.getenv("COMPACTION_RETENTION_DAYS", "30"))
+BATCH_SIZE = 1000
+LOCK_TIMEOUT_MS = 2000
+LOCK_RETRIES = 3
+
+# deleted_at ставиться тригером у момент м'якого видалення; архівні таблиці без
+# зовнішніх ключів, бо категорія архівної витрати сама може бути в архіві
+MIGRATION_SQL = """
+    ALTER TABLE expenses ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+    ALTER TABLE categories ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+
+    CREATE OR REPLACE FUNCTION set_deleted_at() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.is_deleted AND NOT COALESCE(OLD.is_deleted, FALSE) THEN
+            NEW.deleted_at := now();
+        ELSIF NOT NEW.is_deleted THEN
+            NEW.deleted_at := NULL;
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_expenses_deleted_at ON expenses;
+    CREATE TRIGGER trg_expenses_deleted_at BEFORE UPDATE OF is_deleted ON expenses
+        FOR EACH ROW EXECUTE FUNCTION set_deleted_at();
+    DROP TRIGGER IF EXISTS trg_categories_deleted_at ON categories;
+    CREATE TRIGGER trg_categories_deleted_at BEFORE UPDATE OF is_deleted ON categories
+        FOR EACH ROW EXECUTE FUNCTION set_deleted_at();
+
+    -- Вже видалені рядки відлічують вікно зберігання від моменту міграції
+    UPDATE expenses SET deleted_at = now() WHERE is_deleted AND deleted_at IS NULL;
+    UPDATE categories SET deleted_at = now() WHERE is_deleted AND deleted_at IS NULL;
+
+    CREATE INDEX IF NOT EXISTS idx_expenses_deleted_at ON expenses (deleted_at) WHERE is_deleted = TRUE;
+    CREATE INDEX IF NOT EXISTS idx_categories_deleted_at ON categories (deleted_at) WHERE is_deleted = TRUE;
+
+    CREATE TABLE IF NOT EXISTS expenses_archive (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        date DATE NOT NULL,
+        category_id INTEGER,
+        amount DECIMAL(10,2) NOT NULL,
+        is_deleted BOOLEAN,
+        description TEXT,
+        currency CHAR(3),
+        deleted_at TIMESTAMPTZ,
+        archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE TABLE IF NOT EXISTS categories_archive (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        is_deleted BOOLEAN,
+        deleted_at TIMESTAMPTZ,
+        archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+# Кандидати на перенесення; SKIP LOCKED пропускає рядки, які зараз хтось змінює
+_EXPENSE_BATCH = """
+    SELECT id FROM expenses
+    WHERE is_deleted = TRUE AND deleted_at < now() - %(retention)s * INTERVAL '1 day'
+    LIMIT %(limit)s FOR UPDATE SKIP LOCKED
+"""
+
+# Категорію можна архівувати лише тоді, коли на неї не посилається жодна витрата
+_CATEGORY_BATCH = """
+    SELECT c.id FROM categories c
+    WHERE c.is_deleted = TRUE AND c.deleted_at < now() - %(retention)s * INTERVAL '1 day'
+        AND NOT EXISTS (SELECT 1 FROM expenses e WHERE e.category_id = c.id)
+    LIMIT %(limit)s FOR UPDATE SKIP LOCKED
+"""
+
+
+def _common_columns(cursor, source, target):
+    # Спільні стовпці в порядку джерела — схеми гарячої та архівної таблиць можуть розходитись
+    target_columns = set(plain_columns(cursor, target))
+    return [c for c in plain_columns(cursor, source) if c in target_columns]
+
+
+def _move_sql(source, target, columns, where):
+    # Один оператор: DELETE ... RETURNING з гарячої таблиці та INSERT в архів
+    columns = sql.SQL(", ").join(map(sql.Identifier, columns))
+    return sql.SQL("""
+        WITH moved AS (
+            DELETE FROM {source} WHERE id IN ({where}) RETURNING {columns}
+        )
+        INSERT INTO {target} ({columns}) SELECT {columns} FROM moved
+    """).format(source=sql.Identifier(source), target=sql.Identifier(target),
+                columns=columns, where=sql.SQL(where))
+
+
+def _move_batches(source, target, where, params, batch_size, lock_timeout_ms):
+    # Переносить рядки пачками по batch_size, кожна пачка — окрема коротка транзакція.
+    # Якщо блокування не вдалося взяти за lock_timeout, пачка повторюється кілька разів.
+    moved = 0
+    retries = 0
+    params = dict(params, limit=batch_size)
+    while True:
+        try:
+            with transaction() as cursor:
+                cursor.execute("SELECT set_config('lock_timeout', %s, true)", (f"{lock_timeout_ms}ms",))
+                columns = _common_columns(cursor, source, target)
+                cursor.execute(_move_sql(source, target, columns, where), params)
+                count = cursor.rowcount
+        except errors.LockNotAvailable:
+            retries += 1
+            if retries > LOCK_RETRIES:
+                print(f"\n[Компакція]: {source} — не вдалося взяти блокування, решту перенесе наступний запуск.")
+                break
+            time.sleep(0.1 * retries)
+            continue
+        retries = 0
+        moved += count
+        if count < batch_size:
+            break
+    return moved
+
+
+def _table_bytes(cursor, table):
+    # Розмір таблиці разом з індексами та TOAST; для секціонованої — сума всіх секцій
+    cursor.execute("""
+        SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0)
+        FROM pg_partition_tree(%s::regclass)
+    """, (table,))
+    return int(cursor.fetchone()[0])
+
+
+def _sizes():
+    with transaction() as cursor:
+        return {table: _table_bytes(cursor, table) for table in ("expenses", "categories")}
+
+
+def _vacuum(full=False):
+    # VACUUM не виконується в транзакції, тому з'єднання тимчасово переводиться в autocommit.
+    # VACUUM FULL повертає місце ОС, але блокує таблиці на весь час перезапису.
+    command = "VACUUM (FULL, ANALYZE) {}" if full else "VACUUM (ANALYZE) {}"
+    with connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for table in ("expenses", "categories"):
+                    cursor.execute(sql.SQL(command).format(sql.Identifier(table)))
+        finally:
+            conn.autocommit = False
+
+
+def compact(retention_days=RETENTION_DAYS, batch_size=BATCH_SIZE, lock_timeout_ms=LOCK_TIMEOUT_MS,
+            vacuum=True, full=False):
+    # Повертає словник: скільки рядків перенесено і скільки байтів звільнено
+    before = _sizes()
+    params = {"retention": retention_days}
+    # Спершу витрати: вони можуть бути останніми посиланнями на видалені категорії
+    expenses = _move_batches("expenses", "expenses_archive", _EXPENSE_BATCH, params,
+                             batch_size, lock_timeout_ms)
+    categories = _move_batches("categories", "categories_archive", _CATEGORY_BATCH, params,
+                               batch_size, lock_timeout_ms)
+    if vacuum:
+        _vacuum(full)
+    after = _sizes()
+    return {
+        "expenses": expenses,
+        "categories": categories,
+        "bytes_before": sum(before.values()),
+        "bytes_after": sum(after.values()),
+        "bytes_reclaimed": sum(before.values()) - sum(after.values()),
+    }
+
+
+def restore(expense_ids=(), category_ids=()):
+    # Повертає рядки з архіву як активні. Категорії архівних витрат відновлюються
+    # разом з ними; категорія, чию назву вже зайнято, лишається в архіві.
+    from cache import categories as category_cache
+    with transaction() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT category_id FROM expenses_archive
+            WHERE id = ANY(%s) AND category_id IS NOT NULL
+        """, (list(expense_ids),))
+        wanted = set(category_ids) | {row[0] for row in cursor.fetchall()}
+
+        columns = _common_columns(cursor, "categories_archive", "categories")
+        names = sql.SQL(", ").join(map(sql.Identifier, columns))
+        cursor.execute(sql.SQL("""
+            WITH restored AS (
+                DELETE FROM categories_archive a
+                WHERE a.id = ANY(%s)
+                    AND NOT EXISTS (SELECT 1 FROM categories c WHERE c.id = a.id OR c.name = a.name)
+                RETURNING {names}
+            )
+            INSERT INTO categories ({names}) SELECT {names} FROM restored
+        """).format(names=names), (list(wanted),))
+        restored_categories = cursor.rowcount
+        cursor.execute("UPDATE categories SET is_deleted = FALSE WHERE id = ANY(%s) AND is_deleted", (list(wanted),))
+
+        # Витрати з категорією, якої так і немає в categories, не відновлюються
+        columns = _common_columns(cursor, "expenses_archive", "expenses")
+        names = sql.SQL(", ").join(map(sql.Identifier, columns))
+        values = sql.SQL(", ").join(
+            sql.SQL("FALSE") if c == "is_deleted" else sql.SQL("NULL") if c == "deleted_at" else sql.Identifier(c)
+            for c in columns)
+        cursor.execute(sql.SQL("""
+            WITH restored AS (
+                DELETE FROM expenses_archive a
+                WHERE a.id = ANY(%s)
+                    AND (a.category_id IS NULL OR EXISTS (SELECT 1 FROM categories c WHERE c.id = a.category_id))
+                RETURNING {names}
+            )
+            INSERT INTO expenses ({names}) SELECT {values} FROM restored
+        """).format(names=names, values=values), (list(expense_ids),))
+        restored_expenses = cursor.rowcount
+    category_cache.invalidate()
+    return {"expenses": restored_expenses, "categories": restored_categories}
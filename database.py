@@ -1,9 +1,19 @@
 import os
+import time
+import itertools
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import errors
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from instrumentation import Timer, record_query, is_read_only
 
-load_dotenv()
+# .env читається лише тоді, коли параметри підключення не задані в оточенні:
+# скриптові запуски (cron, CLI) не платять за імпорт python-dotenv
+if not all(os.getenv(name) for name in ("DB_NAME", "DB_USER", "DB_HOST")):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 DB_CONFIG = {
     "dbname": os.getenv("DB_NAME"),
@@ -40,73 +50,576 @@ def create_database_if_not_exists():
         print(f"[Помилка ініціалізації сервера]: {e}")
 
 
-def get_connection():
-    # Повертає об'єкт з'єднання з робочою базою
-    return psycopg2.connect(**DB_CONFIG)
+class PreparingConnection(psycopg2.extensions.connection):
+    # З'єднання з реєстром підготовлених операторів (текст запиту -> ім'я PREPARE).
+    # Реєстр живе разом із з'єднанням, тож після перепідключення він порожній
+    # і оператори готуються заново автоматично.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = {}
+        self.prepare_seq = 0
 
 
-def init_db():
-    # Створення бази та таблиць
-    create_database_if_not_exists()
+# Лічильники кешу підготовлених операторів
+PREPARED_STATS = {"hits": 0, "misses": 0, "reprepares": 0, "fallbacks": 0}
+_prepared_lock = threading.Lock()
+
+
+def _count_prepared(name):
+    with _prepared_lock:
+        PREPARED_STATS[name] += 1
+
+
+def prepared_stats():
+    with _prepared_lock:
+        return dict(PREPARED_STATS)
+
+
+def _to_positional(query):
+    # Перетворює %s на $1..$n для PREPARE; іменовані параметри не підтримуються.
+    # %% лишається як є: рядок ще раз проходить через підстановку psycopg2.
+    if "%(" in query:
+        return None, 0
+    parts = query.split("%%")
+    count = 0
+    for i, part in enumerate(parts):
+        pieces = part.split("%s")
+        text = pieces[0]
+        for piece in pieces[1:]:
+            count += 1
+            text += f"${count}" + piece
+        parts[i] = text
+    return "%%".join(parts), count
+
+
+def _execute_prepared(conn, cursor, query, params):
+    # PREPARE/EXECUTE з прозорим поверненням до звичайного виконання
+    params = tuple(params or ())
+    registry = getattr(conn, "prepared", None)
+    name = registry.get(query) if registry is not None else False
+    if name is False:
+        cursor.execute(query, params)
+        return
+    placeholders = ", ".join(["%s"] * len(params))
+    execute_sql = f"EXECUTE {{}} ({placeholders})" if params else "EXECUTE {}"
+
+    if name:
+        _count_prepared("hits")
+        try:
+            cursor.execute(execute_sql.format(name), params)
+            return
+        except errors.InvalidSqlStatementName:
+            # Оператор зник на сервері (DISCARD ALL, перезапуск сесії) — готуємо заново
+            conn.rollback()
+            _count_prepared("reprepares")
+    else:
+        _count_prepared("misses")
+
+    sql, count = _to_positional(query)
+    if sql is None or count != len(params):
+        registry[query] = False
+        cursor.execute(query, params)
+        return
+    conn.prepare_seq += 1
+    name = f"ps_{conn.prepare_seq}"
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            # 1. Створюємо базові таблиці (якщо їх ще немає)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS categories (
-                    id SERIAL PRIMARY KEY,
-                    name TEXT UNIQUE NOT NULL,
-                    is_deleted BOOLEAN DEFAULT FALSE
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS expenses (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    date DATE NOT NULL,
-                    category_id INTEGER REFERENCES categories(id),
-                    amount DECIMAL(10,2) NOT NULL CHECK (amount > 0),
-                    is_deleted BOOLEAN DEFAULT FALSE
-                )
-            """)
-
-            # 2. МІГРАЦІЯ: Перевіряємо та додаємо нові стовпці, якщо вони відсутні
-            cursor.execute("""
-                DO $$ 
-                BEGIN 
-                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
-                                   WHERE table_name='expenses' AND column_name='description') THEN
-                        ALTER TABLE expenses ADD COLUMN description TEXT;
-                    END IF;
-
-                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
-                                   WHERE table_name='expenses' AND column_name='currency') THEN
-                        ALTER TABLE expenses ADD COLUMN currency CHAR(3);
-                    END IF;
-                END $$;
-            """)
-            conn.commit()
-        conn.close()
-        print("[СИСТЕМА]: База даних успішно синхронізована.")
-    except Exception as e:
-        print(f"[Помилка створення таблиць]: {e}")
-def execute_query(query, params=None, fetch=False, fetch_one=False):
-    # Універсальний метод для SQL запитів
+        # PREPARE окремо від EXECUTE: rollback() не скасовує PREPARE, тож помилка в даних
+        # при спільному пакеті лишала б на сервері оператор, про який реєстр уже не знає
+        cursor.execute(f"PREPARE {name} AS {sql}")
+    except psycopg2.Error:
+        # Запит не вдалося підготувати — далі він виконується звичайним способом
+        conn.rollback()
+        registry[query] = False
+        _count_prepared("fallbacks")
+        cursor.execute(query, params)
+        return
+    registry[query] = name
+    # Помилка в даних піднімається звідси як звичайна; оператор лишається придатним
+    cursor.execute(execute_sql.format(name), params)
+
+
+# Параметри пулу з'єднань (можна перевизначити у .env)
+POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN", "1")),
+    "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+    # Скільки секунд чекати на вільне з'єднання, коли пул вичерпано
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    # З'єднання, що простояло довше за цей час, перевіряється запитом SELECT 1
+    "check_idle": float(os.getenv("DB_POOL_CHECK_IDLE", "30")),
+}
+
+
+# Репліки для читання (необов'язково): DB_REPLICAS="host:port,host:port" з тими ж
+# користувачем і базою, що й основний сервер, або повні DSN через кому
+REPLICA_CONFIG = {
+    "replicas": os.getenv("DB_REPLICAS", ""),
+    # Скільки секунд не звертатися до репліки після помилки з'єднання з нею
+    "cooldown": float(os.getenv("DB_REPLICA_COOLDOWN", "30")),
+    # Скільки секунд після запису читати з основного сервера (0 — вимкнено)
+    "read_your_writes": float(os.getenv("DB_READ_YOUR_WRITES", "5")),
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    # Пул з'єднань на весь процес: з'єднання відкриваються один раз і
+    # повторно використовуються замість нового TCP+auth рукостискання на кожен запит
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=30.0, check_idle=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Некоректні розміри пулу (min/max).")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._idle = []  # список (з'єднання, час повернення в пул)
+        self._size = 0   # скільки з'єднань відкрито (вільні + видані)
+        self._cond = threading.Condition()
+        self.stats = {"checkouts": 0, "waits": 0, "reconnects": 0, "connects": 0}
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PreparingConnection, **self.dsn)
+        # Пул-власник: з'єднання з репліки повертається у свій пул
+        conn.pool = self
+        self.stats["connects"] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        # Закриті або "зламані" з'єднання відкидаємо одразу, давно не використані — пінгуємо
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                self.stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        raise PoolTimeout("Немає вільних з'єднань у пулі.")
+            self.stats["checkouts"] += 1
+            if self._idle:
+                conn, idle_since = self._idle.pop()
+            else:
+                conn, idle_since = None, None
+                self._size += 1
+
+        if conn is not None:
+            if self._is_healthy(conn, idle_since):
+                return conn
+            self._discard(conn)
+            self.stats["reconnects"] += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn):
+        # Незавершена транзакція не повинна "протекти" до наступного користувача
+        if not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+        with self._cond:
+            if conn.closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._size -= len(self._idle)
+            self._idle = []
+
+    def status(self):
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle))
+
+
+def _replica_dsns(spec):
+    dsns = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        if "=" in item or "://" in item:
+            dsns.append({"dsn": item})
+        else:
+            host, _, port = item.partition(":")
+            dsns.append(dict(DB_CONFIG, host=host, port=port or DB_CONFIG["port"]))
+    return dsns
+
+
+class ReplicaRouter:
+    # Розподіляє читання між репліками по колу. Репліка, до якої не вдалося
+    # під'єднатися, пропускається cooldown секунд; якщо живих реплік немає — читаємо з основного.
+    def __init__(self, dsns, cooldown=30.0, pool_config=None):
+        # Пули реплік не відкривають з'єднань заздалегідь: недоступна репліка не заважає старту
+        pool_config = dict(pool_config or {}, min_size=0)
+        self.dsns = dsns
+        self.pools = [ConnectionPool(dsn, **pool_config) for dsn in dsns]
+        self.cooldown = cooldown
+        self._down_until = [0.0] * len(dsns)
+        self._next = itertools.count()
+        self.stats = {"reads": 0, "failovers": 0, "primary_fallbacks": 0}
+
+    def _candidates(self):
+        # Індекси доступних реплік, починаючи з наступної по колу
+        start = next(self._next)
+        now = time.monotonic()
+        for offset in range(len(self.pools)):
+            index = (start + offset) % len(self.pools)
+            if self._down_until[index] <= now:
+                yield index
+
+    def mark_down(self, index):
+        self._down_until[index] = time.monotonic() + self.cooldown
+        self.stats["failovers"] += 1
+
+    def index_of(self, conn):
+        pool = getattr(conn, "pool", None)
+        return self.pools.index(pool) if pool in self.pools else None
+
+    def getconn(self):
+        # З'єднання з наступної живої репліки або None
+        for index in self._candidates():
+            try:
+                conn = self.pools[index].getconn()
+            except psycopg2.OperationalError:
+                self.mark_down(index)
+                continue
+            except PoolTimeout:
+                # Репліка жива, але зайнята — пробуємо наступну
+                continue
+            self.stats["reads"] += 1
+            return conn
+        self.stats["primary_fallbacks"] += 1
+        return None
+
+    def read_dsns(self):
+        # Параметри підключення доступних реплік по колу (для окремих з'єднань поза пулом)
+        return [self.dsns[index] for index in self._candidates()]
+
+    def closeall(self):
+        for pool in self.pools:
+            pool.closeall()
+
+    def status(self):
+        now = time.monotonic()
+        return dict(self.stats, replicas=[dict(pool.status(), down=until > now)
+                                          for pool, until in zip(self.pools, self._down_until)])
+
+
+# Стан сесії (потоку) для read-your-writes: до якого моменту читати з основного сервера
+_session = threading.local()
+
+
+def mark_write():
+    if REPLICA_CONFIG["read_your_writes"] > 0:
+        _session.primary_until = time.monotonic() + REPLICA_CONFIG["read_your_writes"]
+
+
+def pinned_to_primary():
+    return time.monotonic() < getattr(_session, "primary_until", 0.0)
+
+
+_pool = None
+_router = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Пул створюється ліниво при першому запиті
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+    return _pool
+
+
+def get_router():
+    # Маршрутизатор реплік; None, якщо DB_REPLICAS не задано
+    global _router
+    if _router is None and REPLICA_CONFIG["replicas"]:
+        with _pool_lock:
+            if _router is None:
+                _router = ReplicaRouter(_replica_dsns(REPLICA_CONFIG["replicas"]),
+                                        REPLICA_CONFIG["cooldown"], POOL_CONFIG)
+    return _router
+
+
+def close_pool():
+    global _pool, _router
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        if _router is not None:
+            _router.closeall()
+            _router = None
+
+
+def pool_stats():
+    # Лічильники пулу: видачі, очікування, перепідключення (і реплік, якщо вони є)
+    stats = get_pool().status()
+    router = get_router()
+    if router is not None:
+        stats["replicas"] = router.status()
+    return stats
+
+
+def read_dsns():
+    # Куди підключатися для довгого читання поза пулом: живі репліки, потім основний сервер
+    router = get_router()
+    if router is None or pinned_to_primary():
+        return [DB_CONFIG]
+    return router.read_dsns() + [DB_CONFIG]
+
+
+def get_connection(readonly=False):
+    # Повертає з'єднання з пулу; після роботи його треба повернути через release_connection.
+    # readonly=True — читання можна віддати репліці, якщо сесія щойно нічого не записала
+    if readonly and not pinned_to_primary():
+        router = get_router()
+        conn = router.getconn() if router is not None else None
+        if conn is not None:
+            return conn
+    return get_pool().getconn()
+
+
+def release_connection(conn):
+    (getattr(conn, "pool", None) or get_pool()).putconn(conn)
+
+
+@contextmanager
+def connection(readonly=False):
+    # Видає з'єднання з пулу на час блоку with і гарантовано повертає його.
+    # Усередині read_session читання йдуть на закріплене з'єднання сесії
+    pinned = getattr(_session, "read_conn", None) if readonly else None
+    conn = pinned or get_connection(readonly)
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, params or ())
-            if fetch:
-                result = cursor.fetchall()
-                conn.close()
-                return result
-            if fetch_one:
-                result = cursor.fetchone()
-                conn.close()
-                return result
+        yield conn
+    except psycopg2.OperationalError:
+        # Обірване з'єднання з реплікою виводить її з ротації на cooldown
+        router = _router
+        index = router.index_of(conn) if router is not None else None
+        if index is not None and conn.closed:
+            router.mark_down(index)
+        raise
+    finally:
+        if pinned is None:
+            release_connection(conn)
+
+
+def in_read_session():
+    return getattr(_session, "read_conn", None) is not None
+
+
+@contextmanager
+def read_session():
+    # Кілька читань підряд на одному з'єднанні, а отже на одному вузлі: з репліками інакше
+    # кожен запит міг би піти на іншу репліку з іншим відставанням. Без реплік нічого не робить
+    if in_read_session() or get_router() is None or pinned_to_primary():
+        yield
+        return
+    with connection(readonly=True) as conn:
+        _session.read_conn = conn
+        try:
+            yield
+        finally:
+            _session.read_conn = None
+
+
+@contextmanager
+def transaction():
+    # Одиниця роботи: кілька запитів на одному з'єднанні й один COMMIT наприкінці.
+    # Будь-який виняток усередині блоку відкочує всю транзакцію.
+    with connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                yield cursor
             conn.commit()
-        conn.close()
-        return True
+            mark_write()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def plain_columns(cursor, table):
+    # Стовпці таблиці без GENERATED-виразів у порядку визначення: лише їх можна
+    # переносити між таблицями через INSERT ... SELECT
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+# Перевірка наявності витрат і видалення категорії — один атомарний запит;
+# FOR UPDATE не дає паралельно додати витрату в цю категорію.
+# Повертає (чи є активні витрати, скільки категорій видалено)
+DELETE_CATEGORY_SQL = """
+    WITH target AS (
+        SELECT c.id, EXISTS (SELECT 1 FROM expenses e
+                             WHERE e.category_id = c.id AND e.is_deleted = FALSE) AS busy
+        FROM categories c WHERE c.id=%s AND c.is_deleted=FALSE
+        FOR UPDATE
+    ), deleted AS (
+        UPDATE categories c SET is_deleted=TRUE
+        FROM target WHERE c.id = target.id AND NOT target.busy
+        RETURNING c.id
+    )
+    SELECT (SELECT busy FROM target), (SELECT COUNT(*) FROM deleted)
+"""
+
+
+# Додавання однієї витрати (пункт меню, навантажувальний тест); частий запит — виконується
+# як підготовлений оператор
+INSERT_EXPENSE_SQL = """
+    INSERT INTO expenses (title, date, category_id, amount, description, currency)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+# Порядок стовпців для пакетних операцій з витратами
+EXPENSE_COLUMNS = ("title", "date", "category_id", "amount", "description", "currency")
+
+
+def update_expenses(rows, cursor=None, page_size=1000):
+    # Пакетне оновлення через UPDATE ... FROM (VALUES ...); rows — (id, *EXPENSE_COLUMNS).
+    # Повертає кількість оновлених (активних) витрат.
+    query = f"""
+        UPDATE expenses e
+        SET {', '.join(f"{column}=v.{column}" for column in EXPENSE_COLUMNS)}
+        FROM (VALUES %s) AS v(id, {', '.join(EXPENSE_COLUMNS)})
+        WHERE e.id = v.id AND e.is_deleted = FALSE
+    """
+    template = "(%s::int, %s, %s::date, %s::int, %s::numeric, %s, %s::char(3))"
+    if cursor is None:
+        with transaction() as cursor:
+            return _update_rows(cursor, query, rows, template, page_size)
+    return _update_rows(cursor, query, rows, template, page_size)
+
+
+def _update_rows(cursor, query, rows, template, page_size):
+    # execute_values виконує запит сторінками, тому rowcount сумуємо вручну
+    updated = 0
+    rows = list(rows)
+    for start in range(0, len(rows), page_size):
+        execute_values(cursor, query, rows[start:start + page_size], template=template, page_size=page_size)
+        updated += cursor.rowcount
+    return updated
+
+
+def _run_query(query, params, fetch, fetch_one, prepared, readonly, timer):
+    with connection(readonly) as conn:
+        acquire_ms = timer.lap()
+        with conn.cursor() as cursor:
+            try:
+                if prepared:
+                    _execute_prepared(conn, cursor, query, params)
+                else:
+                    cursor.execute(query, params or ())
+                if fetch:
+                    result = cursor.fetchall()
+                    rows = len(result)
+                elif fetch_one:
+                    result = cursor.fetchone()
+                    rows = int(result is not None)
+                else:
+                    conn.commit()
+                    mark_write()
+                    result, rows = True, cursor.rowcount
+            except Exception as e:
+                record_query(query, acquire_ms, timer.lap(), None, error=e)
+                raise
+            record_query(query, acquire_ms, timer.lap(), rows, cursor=cursor, params=params)
+    return result
+
+
+def execute_query(query, params=None, fetch=False, fetch_one=False, prepared=False):
+    # Універсальний метод для SQL запитів; кожен запит вимірюється і потрапляє в журнал.
+    # prepared=True — для частих запитів: план готується один раз на з'єднання.
+    # Запити лише на читання (fetch/fetch_one + SELECT) ідуть на репліки, якщо вони налаштовані.
+    timer = Timer()
+    readonly = bool(fetch or fetch_one) and is_read_only(query)
+    try:
+        try:
+            return _run_query(query, params, fetch, fetch_one, prepared, readonly, timer)
+        except psycopg2.OperationalError:
+            # У read_session повтор на іншому вузлі порушив би узгодженість читань сесії
+            if not readonly or get_router() is None or in_read_session():
+                raise
+            # Репліка відпала або скасувала запит (конфлікт з відновленням) — повторюємо на основному
+            timer = Timer()
+            return _run_query(query, params, fetch, fetch_one, prepared, False, timer)
     except Exception as e:
         print("\n[Помилка БД]:", e)
-        return None
\ No newline at end of file
+        return None
+
+
+def build_page_query(query, params, keys, after=None, before=None, size=20):
+    # Keyset (seek) пагінація: замість OFFSET продовжуємо від ключа останнього/першого рядка,
+    # тож сторінка N коштує стільки ж, скільки перша. Запит має закінчуватися умовою WHERE.
+    # Вибирається size+1 рядок, щоб дізнатися про наступну сторінку без окремого COUNT(*).
+    params = list(params)
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["%s"] * len(keys))
+    if after is not None:
+        query += f" AND ({columns}) > ({placeholders})"
+        params.extend(after)
+    elif before is not None:
+        query += f" AND ({columns}) < ({placeholders})"
+        params.extend(before)
+    direction = " DESC" if before is not None else ""
+    query += " ORDER BY " + ", ".join(key + direction for key in keys) + " LIMIT %s"
+    params.append(size + 1)
+    return query, tuple(params)
+
+
+def finish_page(rows, before=None, size=20):
+    # (рядки сторінки в прямому порядку, чи є ще рядки в цьому напрямку)
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if before is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+def fetch_page(query, params, keys, after=None, before=None, size=20):
+    # Повертає (рядки, чи є ще рядки в цьому напрямку); (None, False) при помилці БД
+    query, params = build_page_query(query, params, keys, after, before, size)
+    rows = execute_query(query, params, fetch=True)
+    if rows is None:
+        return None, False
+    return finish_page(rows, before, size)
@@ -0,0 +1,415 @@
+import os
+import csv
+import gzip
+import json
+import hashlib
+import datetime
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import psycopg2
+from database import connection, read_dsns
+
+CSV_HEADER = ["Дата", "Назва", "Сума", "Валюта", "Категорія", "Опис"]
+EXPORT_PATH = "export/report.csv"
+# Скільки рядків за раз забирає серверний курсор
+FETCH_SIZE = 5000
+
+# Паралельний експорт: каталог із файлами шардів і маніфестом
+PARALLEL_DIR = "export/parallel"
+MANIFEST_FILE = "manifest.json"
+SHARD_KEYS = {"id": "e.id", "date": "e.date"}
+
+# Інкрементальний експорт змін: дельта-файли, базовий файл і стан з водяним знаком
+CHANGES_DIR = "export/changes"
+CHANGES_STATE = "state.json"
+CHANGES_BASE = "base.csv"
+# op: U — рядок додано або змінено (повні дані), D — рядок видалено (лише id)
+CHANGES_HEADER = ["op", "id"] + CSV_HEADER
+
+# updated_at ставиться тригером на кожен INSERT/UPDATE, зокрема на м'яке видалення.
+# clock_timestamp(), а не now(): час запису, а не початку транзакції, — так
+# водяний знак можна безпечно обмежити початком найстарішої відкритої транзакції
+CHANGES_MIGRATION_SQL = """
+    ALTER TABLE expenses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+    ALTER TABLE categories ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+    CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_expenses_updated_at ON expenses;
+    CREATE TRIGGER trg_expenses_updated_at BEFORE INSERT OR UPDATE ON expenses
+        FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+    DROP TRIGGER IF EXISTS trg_categories_updated_at ON categories;
+    CREATE TRIGGER trg_categories_updated_at BEFORE INSERT OR UPDATE ON categories
+        FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+    CREATE INDEX IF NOT EXISTS idx_expenses_updated_at ON expenses (updated_at);
+    CREATE INDEX IF NOT EXISTS idx_categories_updated_at ON categories (updated_at);
+"""
+
+# xact_start чужих сеансів інших ролей видно лише з правами pg_read_all_stats (або
+# суперкористувачу); без них такі транзакції випали б з розрахунку межі, водяний знак
+# пройшов би повз їхній updated_at і рядки загубилися б у потоці змін
+CHANGES_PRIVILEGE_SQL = "SELECT pg_has_role('pg_read_all_stats', 'USAGE')"
+
+# Верхня межа вікна змін: рядки будь-якої ще не зафіксованої транзакції матимуть
+# updated_at не раніше її xact_start, тож усе, що раніше межі, вже видно
+CHANGES_HIGH_SQL = """
+    SELECT LEAST(clock_timestamp(), (
+        SELECT MIN(xact_start) FROM pg_stat_activity
+        WHERE pid <> pg_backend_pid() AND backend_type = 'client backend'
+            AND datname = current_database() AND xact_start IS NOT NULL
+    ))
+"""
+
+# Зміни у вікні [low, high): змінені витрати, витрати перейменованих категорій і
+# надгробки (D) для видалених; при першому запуску надгробки не потрібні
+CHANGES_SQL = """
+    SELECT 'U', e.id, e.date, e.title, e.amount, e.currency, c.name, e.description
+    FROM expenses e LEFT JOIN categories c ON e.category_id = c.id
+    WHERE e.is_deleted = FALSE AND e.id IN (
+        SELECT id FROM expenses WHERE updated_at >= %(low)s AND updated_at < %(high)s
+        UNION
+        SELECT x.id FROM expenses x JOIN categories k ON x.category_id = k.id
+        WHERE k.updated_at >= %(low)s AND k.updated_at < %(high)s AND x.is_deleted = FALSE
+    )
+    UNION ALL
+    SELECT 'D', id, NULL, NULL, NULL, NULL, NULL, NULL FROM expenses
+    WHERE is_deleted = TRUE AND updated_at >= %(low)s AND updated_at < %(high)s
+        AND %(low)s::timestamptz > '-infinity'
+    ORDER BY 2
+"""
+
+
+def _export_filters(date_from=None, date_to=None, category=None, currency=None):
+    # Умови фільтрів експорту, що дописуються після WHERE e.is_deleted=FALSE
+    where = ""
+    params = []
+    if date_from:
+        where += " AND e.date >= %s"
+        params.append(date_from)
+    if date_to:
+        where += " AND e.date <= %s"
+        params.append(date_to)
+    if category:
+        where += " AND c.name = %s"
+        params.append(category)
+    if currency:
+        where += " AND e.currency = %s"
+        params.append(currency.upper())
+    return where, params
+
+
+def build_export_query(date_from=None, date_to=None, category=None, currency=None, shard=None):
+    # Запит експорту з необов'язковими фільтрами; стовпці у порядку CSV_HEADER.
+    # shard — (стовпець, від, до): лише рядки з від <= стовпець < до
+    query = """
+        SELECT e.date, e.title, e.amount, e.currency, c.name, e.description
+        FROM expenses e JOIN categories c ON e.category_id = c.id
+        WHERE e.is_deleted=FALSE
+    """
+    where, params = _export_filters(date_from, date_to, category, currency)
+    query += where
+    if shard:
+        column, lower, upper = shard
+        query += f" AND {column} >= %s AND {column} < %s"
+        params += [lower, upper]
+    query += " ORDER BY e.id"
+    return query, params
+
+
+def _open_text(path, compress):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _write_copy(cursor, query, params, out):
+    # COPY ... TO STDOUT: сервер сам формує CSV, клієнт лише переносить байти у файл
+    sql = cursor.mogrify(query, params).decode()
+    cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", out)
+    return cursor.rowcount if cursor.rowcount >= 0 else None
+
+
+def _write_cursor(conn, query, params, out, fetch_size):
+    # Іменований (серверний) курсор віддає рядки порціями по fetch_size
+    writer = csv.writer(out)
+    rows = 0
+    with conn.cursor(name="export_cursor") as cursor:
+        cursor.itersize = fetch_size
+        cursor.execute(query, params)
+        for row in cursor:
+            writer.writerow(row)
+            rows += 1
+    return rows
+
+
+def export_expenses(path=EXPORT_PATH, date_from=None, date_to=None, category=None,
+                    currency=None, compress=False, mode="copy", fetch_size=FETCH_SIZE):
+    # Потоковий експорт: пам'ять не залежить від розміру таблиці.
+    # Файл пишеться у тимчасовий поруч і атомарно підміняє старий через os.replace.
+    if mode not in ("copy", "cursor"):
+        raise ValueError("Режим експорту має бути 'copy' або 'cursor'.")
+    if compress and not path.endswith(".gz"):
+        path += ".gz"
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    query, params = build_export_query(date_from, date_to, category, currency)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".export-", suffix=".tmp")
+    os.close(fd)
+    try:
+        with _open_text(tmp_path, compress) as out, connection(readonly=True) as conn:
+            csv.writer(out).writerow(CSV_HEADER)
+            out.flush()
+            if mode == "copy":
+                with conn.cursor() as cursor:
+                    rows = _write_copy(cursor, query, params, out)
+            else:
+                rows = _write_cursor(conn, query, params, out, fetch_size)
+        # mkstemp створює файл з правами 0600, а звіт має бути доступним як і раніше
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path, rows
+
+
+def _read_state(directory):
+    try:
+        with open(os.path.join(directory, CHANGES_STATE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"watermark": None, "base": None, "deltas": []}
+
+
+def _write_state(directory, state):
+    # Стан пишеться останнім і атомарно: файл, не згаданий у стані, вважається незавершеним
+    tmp_path = os.path.join(directory, CHANGES_STATE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(directory, CHANGES_STATE))
+
+
+def _replace_atomically(directory, path, write):
+    # Записує файл через тимчасовий поруч і підміняє ним цільовий
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".changes-", suffix=".tmp")
+    os.close(fd)
+    try:
+        result = write(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return result
+
+
+def export_changes(directory=CHANGES_DIR, compress=False):
+    # Пише в новий дельта-файл лише рядки, змінені після попереднього запуску.
+    # Перший запуск вивантажує всі активні витрати. Повертає (шлях або None, кількість рядків).
+    os.makedirs(directory, exist_ok=True)
+    state = _read_state(directory)
+    low = state["watermark"] or "-infinity"
+
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(CHANGES_PRIVILEGE_SQL)
+            if not cursor.fetchone()[0]:
+                raise PermissionError("Для експорту змін роль БД потребує pg_read_all_stats: "
+                                      "GRANT pg_read_all_stats TO <роль>.")
+            cursor.execute(CHANGES_HIGH_SQL)
+            high = cursor.fetchone()[0]
+            conn.commit()
+            # Новий оператор — новий знімок (READ COMMITTED): усе до high вже зафіксовано
+            query = cursor.mogrify(CHANGES_SQL, {"low": low, "high": high}).decode()
+            name = f"delta-{high:%Y%m%dT%H%M%S%f}.csv" + (".gz" if compress else "")
+            path = os.path.join(directory, name)
+
+            def write(tmp_path):
+                with _open_text(tmp_path, compress) as out:
+                    csv.writer(out).writerow(CHANGES_HEADER)
+                    out.flush()
+                    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", out)
+                return cursor.rowcount
+
+            rows = _replace_atomically(directory, path, write)
+            conn.commit()
+
+    if rows:
+        state["deltas"].append(name)
+    else:
+        os.remove(path)
+        path = None
+    state["watermark"] = high.isoformat()
+    _write_state(directory, state)
+    return path, rows
+
+
+def _open_read(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def compact_changes(directory=CHANGES_DIR):
+    # Зливає базовий файл і всі дельти в новий base.csv (останній стан кожного id,
+    # без видалених) і прибирає злиті дельти. Повертає (шлях, кількість рядків).
+    state = _read_state(directory)
+    rows = {}
+    sources = ([state["base"]] if state["base"] else []) + state["deltas"]
+    for name in sources:
+        with _open_read(os.path.join(directory, name)) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row[0] == "D":
+                    rows.pop(int(row[1]), None)
+                else:
+                    rows[int(row[1])] = row
+
+    path = os.path.join(directory, CHANGES_BASE)
+
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(CHANGES_HEADER)
+            writer.writerows(rows[exp_id] for exp_id in sorted(rows))
+
+    _replace_atomically(directory, path, write)
+    # Повторне застосування вже злитих дельт до бази нічого не змінює,
+    # тож збій між записом стану й видаленням файлів безпечний
+    merged = state["deltas"]
+    state["base"] = CHANGES_BASE
+    state["deltas"] = []
+    _write_state(directory, state)
+    for name in merged:
+        os.remove(os.path.join(directory, name))
+    return path, len(rows)
+
+
+def _shard_ranges(lower, upper, shards):
+    # Ділить [lower, upper] на рівні напівінтервали [від, до); для дат — за кількістю днів
+    is_date = isinstance(lower, datetime.date)
+    if is_date:
+        lower, upper = lower.toordinal(), upper.toordinal()
+    upper += 1
+    step = max(1, -(-(upper - lower) // shards))
+    ranges = [(start, min(start + step, upper)) for start in range(lower, upper, step)]
+    if is_date:
+        ranges = [(datetime.date.fromordinal(a), datetime.date.fromordinal(b)) for a, b in ranges]
+    return ranges
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _connect_for_read():
+    # Перша доступна репліка, інакше основний сервер; повертає (з'єднання, параметри)
+    candidates = read_dsns()
+    for dsn in candidates[:-1]:
+        try:
+            return psycopg2.connect(**dsn), dsn
+        except psycopg2.OperationalError:
+            continue
+    return psycopg2.connect(**candidates[-1]), candidates[-1]
+
+
+def _export_shard(dsn, snapshot_id, query, params, path, compress):
+    # Виконується в окремому процесі на власному з'єднанні (не з пулу батьківського процесу)
+    # до того ж сервера, що й координатор. SET TRANSACTION SNAPSHOT дає той самий знімок даних.
+    conn = psycopg2.connect(**dsn)
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+            with _open_text(path, compress) as out:
+                csv.writer(out).writerow(CSV_HEADER)
+                out.flush()
+                rows = _write_copy(cursor, query, params, out)
+        conn.rollback()
+    finally:
+        conn.close()
+    return {"file": os.path.basename(path), "rows": rows,
+            "bytes": os.path.getsize(path), "sha256": _sha256(path)}
+
+
+def export_parallel(directory=PARALLEL_DIR, shards=None, by="id", date_from=None, date_to=None,
+                    category=None, currency=None, compress=False):
+    # Ділить витрати на діапазони за id або датою і вивантажує їх паралельно пулом процесів.
+    # Координатор тримає транзакцію REPEATABLE READ і передає її знімок (pg_export_snapshot)
+    # усім процесам, тож шарди разом — узгоджений стан на одну мить.
+    # Повертає (шлях до маніфесту, кількість рядків).
+    if by not in SHARD_KEYS:
+        raise ValueError("Шардування можливе лише за 'id' або 'date'.")
+    shards = shards or os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    column = SHARD_KEYS[by]
+    suffix = ".csv.gz" if compress else ".csv"
+
+    conn, dsn = _connect_for_read()
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_export_snapshot()")
+            snapshot_id = cursor.fetchone()[0]
+            where, params = _export_filters(date_from, date_to, category, currency)
+            cursor.execute(f"""
+                SELECT MIN({column}), MAX({column})
+                FROM expenses e JOIN categories c ON e.category_id = c.id
+                WHERE e.is_deleted=FALSE {where}
+            """, params)
+            lower, upper = cursor.fetchone()
+
+        results = []
+        if lower is not None:
+            jobs = []
+            for number, (start, end) in enumerate(_shard_ranges(lower, upper, shards), 1):
+                query, query_params = build_export_query(date_from, date_to, category, currency,
+                                                         shard=(column, start, end))
+                path = os.path.join(directory, f"shard-{number:04d}{suffix}")
+                jobs.append((dsn, snapshot_id, query, query_params, path, compress))
+            # spawn: дочірні процеси не успадковують сокети з'єднань батьківського процесу
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(shards, len(jobs)), mp_context=context) as pool:
+                futures = [pool.submit(_export_shard, *job) for job in jobs]
+                for job, future in zip(jobs, futures):
+                    result = future.result()
+                    result["range"] = [str(job[3][-2]), str(job[3][-1])]
+                    results.append(result)
+        # Знімок має жити, доки всі процеси не імпортують його, тож транзакцію закриваємо останньою
+        conn.rollback()
+    finally:
+        conn.close()
+
+    # Шарди з попереднього запуску, яких немає в новому маніфесті, видаляються
+    current = {result["file"] for result in results}
+    for name in os.listdir(directory):
+        if name.startswith("shard-") and name not in current:
+            os.remove(os.path.join(directory, name))
+
+    manifest = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "shard_key": by,
+        "filters": {"date_from": date_from, "date_to": date_to, "category": category, "currency": currency},
+        "rows": sum(result["rows"] or 0 for result in results),
+        "shards": results,
+    }
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path, manifest["rows"]
@@ -0,0 +1,145 @@
+import io
+import math
+import random
+import argparse
+import datetime
+from psycopg2.extras import execute_values
+from database import transaction
+from cache import categories as category_cache
+
+# Базові категорії з колишнього seed_data; решта генерується як "Категорія NNNN"
+BASE_CATEGORIES = ["Продукти", "Транспорт", "Розваги", "Комунальні", "Здоров'я", "Освіта", "Інше"]
+
+# Профілі категорій: (назви покупок, медіана суми, розкид логнормального розподілу)
+PROFILES = {
+    "Продукти": (["Сільпо", "АТБ", "Novus", "Овочі", "Ринок", "Пекарня"], 420, 0.6),
+    "Транспорт": (["WOG Паливо", "Таксі Bolt", "Метро", "Uber", "Квиток Укрзалізниці"], 250, 0.9),
+    "Розваги": (["Кіно", "Вечеря", "Концерт", "Боулінг", "Кав'ярня"], 450, 0.7),
+    "Комунальні": (["Інтернет", "Електроенергія", "Газ", "Вода", "Мобільний зв'язок"], 600, 0.5),
+    "Здоров'я": (["Аптека", "Спортзал", "Стоматолог", "Аналізи"], 700, 0.8),
+    "Освіта": (["Курс Python", "Книга", "Онлайн-курс", "Підручник"], 900, 1.0),
+    "Інше": (["Подарунок", "Ремонт", "Одяг", "Побутова техніка"], 800, 1.1),
+}
+DEFAULT_PROFILE = (["Покупка", "Оплата", "Замовлення", "Послуга"], 500, 0.9)
+
+# Валюта NULL теж зустрічається, як у початкових сидах
+CURRENCIES = ["UAH", "USD", "EUR", None]
+CURRENCY_WEIGHTS = [0.86, 0.05, 0.04, 0.05]
+DESCRIPTIONS = ["Закупівля на тиждень", "Абонемент на місяць", "Зустріч з друзями", "За минулий місяць",
+                "Оплата карткою", "Готівка", "Знижка", "Подарунок для друга"]
+DESCRIPTION_RATE = 0.6
+
+BATCH_SIZE = 50000
+MAX_AMOUNT = 99999999.99
+
+
+def category_names(count):
+    names = BASE_CATEGORIES[:count]
+    names += [f"Категорія {i:04d}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def _copy_text(value):
+    # Екранування для текстового формату COPY
+    if value is None:
+        return "\\N"
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def generate_expenses(rng, count, categories, start, days):
+    # Генератор рядків (title, date, category_id, amount, description, currency).
+    # categories — список (id, назва); дати зсунуті до кінця періоду (кількість
+    # витрат з часом зростає), вихідні трохи активніші, суми — логнормальні.
+    profiles = []
+    for cat_id, name in categories:
+        titles, median, sigma = PROFILES.get(name, DEFAULT_PROFILE)
+        profiles.append((cat_id, titles, math.log(median), sigma))
+    cum_currency = list(_accumulate(CURRENCY_WEIGHTS))
+
+    for _ in range(count):
+        cat_id, titles, mu, sigma = profiles[int(rng.random() * len(profiles))]
+        offset = min(int(math.sqrt(rng.random()) * days), days - 1)
+        date = start + datetime.timedelta(days=offset)
+        if date.weekday() < 5 and rng.random() < 0.15:
+            date += datetime.timedelta(days=5 - date.weekday())
+            if date >= start + datetime.timedelta(days=days):
+                date -= datetime.timedelta(days=7)
+        amount = min(max(round(rng.lognormvariate(mu, sigma), 2), 0.01), MAX_AMOUNT)
+        description = DESCRIPTIONS[int(rng.random() * len(DESCRIPTIONS))] \
+            if rng.random() < DESCRIPTION_RATE else None
+        currency = rng.choices(CURRENCIES, cum_weights=cum_currency)[0]
+        yield titles[int(rng.random() * len(titles))], date, cat_id, amount, description, currency
+
+
+def _accumulate(weights):
+    total = 0.0
+    for weight in weights:
+        total += weight
+        yield total
+
+
+def _copy_rows(cursor, rows):
+    buffer = io.StringIO()
+    for title, date, cat_id, amount, description, currency in rows:
+        buffer.write(f"{_copy_text(title)}\t{date.isoformat()}\t{cat_id}\t{amount:.2f}\t"
+                     f"{_copy_text(description)}\t{_copy_text(currency)}\n")
+    buffer.seek(0)
+    cursor.copy_expert("""
+        COPY expenses (title, date, category_id, amount, description, currency) FROM STDIN
+    """, buffer)
+
+
+def seed(categories=7, expenses=14, seed_value=42, start="2026-01-01", days=60,
+         replace=False, batch_size=BATCH_SIZE, progress=None):
+    # Детермінований генератор: однаковий seed_value дає однакові дані.
+    # Витрати завантажуються пакетами через COPY в одній транзакції.
+    rng = random.Random(seed_value)
+    start_date = datetime.date.fromisoformat(start)
+    names = category_names(categories)
+
+    with transaction() as cursor:
+        # Масове завантаження не потребує синхронного очікування WAL на кожен коміт
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        if replace:
+            # TRUNCATE не запускає тригери, тому зведення і скетчі очищаємо разом з витратами
+            cursor.execute("TRUNCATE expenses, daily_rollup, expense_sketch RESTART IDENTITY")
+        execute_values(cursor, "INSERT INTO categories (name) VALUES %s ON CONFLICT (name) DO NOTHING",
+                       [(name,) for name in names])
+        cursor.execute("SELECT id, name FROM categories WHERE name = ANY(%s) AND is_deleted=FALSE ORDER BY id",
+                       (names,))
+        cat_rows = cursor.fetchall()
+        if not cat_rows:
+            raise ValueError("Немає активних категорій для генерації витрат.")
+
+        loaded = 0
+        batch = []
+        for row in generate_expenses(rng, expenses, cat_rows, start_date, days):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _copy_rows(cursor, batch)
+                loaded += len(batch)
+                batch = []
+                if progress:
+                    progress(loaded)
+        if batch:
+            _copy_rows(cursor, batch)
+            loaded += len(batch)
+    category_cache.invalidate()
+    return len(cat_rows), loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерація синтетичних витрат")
+    parser.add_argument("--categories", type=int, default=7)
+    parser.add_argument("--expenses", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--replace", action="store_true", help="очистити expenses перед завантаженням")
+    args = parser.parse_args()
+
+    cats, rows = seed(args.categories, args.expenses, args.seed, args.start, args.days,
+                      args.replace, args.batch_size,
+                      progress=lambda n: print(f"Завантажено {n} рядків...", flush=True))
+    print(f"[УСПІХ]: Категорій: {cats}, витрат: {rows}.")
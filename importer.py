@@ -0,0 +1,162 @@
+import csv
+import io
+import os
+import contextlib
+from decimal import Decimal, InvalidOperation
+from database import transaction
+from cache import categories
+from exporter import CSV_HEADER
+from utils import validate_date, validate_amount
+from models import CENT, MAX_AMOUNT
+
+BATCH_SIZE = 10000
+
+
+def validate_row(row):
+    # Повертає текст помилки або None, якщо рядок можна завантажувати
+    if len(row) != len(CSV_HEADER):
+        return f"Очікується {len(CSV_HEADER)} стовпців, отримано {len(row)}"
+    date, title, amount, currency, category, _ = row
+    if not validate_date(date):
+        return "Невірний формат дати"
+    if not title.strip():
+        return "Порожня назва"
+    if not validate_amount(amount):
+        return "Сума має бути додатним числом"
+    try:
+        value = Decimal(amount)
+    except InvalidOperation:
+        return "Сума має бути додатним числом"
+    # Нулі в кінці ("1.500") допустимі: важливо лише, чи змінюється значення при округленні до копійки
+    if value > MAX_AMOUNT or value.quantize(CENT) != value:
+        return "Сума поза межами DECIMAL(10,2)"
+    if currency and (len(currency) != 3 or not currency.isalpha()):
+        return "Код валюти має складатися з 3 літер"
+    if not category.strip():
+        return "Порожня категорія"
+    return None
+
+
+def _copy_batch(cursor, buffer):
+    # Відправляє накопичений пакет у staging-таблицю одним COPY
+    buffer.seek(0)
+    cursor.copy_expert("""
+        COPY import_staging (line_no, date, title, amount, currency, category, description)
+        FROM STDIN WITH (FORMAT csv)
+    """, buffer)
+
+
+class _ErrorsFile:
+    # Файл відхилених рядків створюється лише тоді, коли з'являється перша помилка
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.writer = None
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["Рядок"] + CSV_HEADER + ["Помилка"])
+        return self.file
+
+    def writerow(self, row):
+        self.open()
+        self.writer.writerow(row)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def import_csv(path, errors_path=None, batch_size=BATCH_SIZE, create_categories=True):
+    # Потокове завантаження CSV у expenses через COPY FROM STDIN і staging-таблицю.
+    # У пам'яті тримається лише один пакет рядків, тож розмір файлу не важливий.
+    if errors_path is None:
+        errors_path = os.path.splitext(path)[0] + ".errors.csv"
+    stats = {"read": 0, "imported": 0, "rejected": 0}
+
+    errors = _ErrorsFile(errors_path)
+    with open(path, newline="", encoding="utf-8-sig") as src, contextlib.closing(errors), \
+            transaction() as cursor:
+        reader = csv.reader(src)
+        header = next(reader, None)
+        if header != CSV_HEADER:
+            raise ValueError(f"Невірний заголовок CSV, очікується: {', '.join(CSV_HEADER)}")
+
+        cursor.execute("""
+            CREATE TEMP TABLE import_staging (
+                line_no INTEGER NOT NULL,
+                date DATE NOT NULL,
+                title TEXT NOT NULL,
+                amount DECIMAL(10,2) NOT NULL,
+                currency CHAR(3),
+                category TEXT NOT NULL,
+                description TEXT
+            ) ON COMMIT DROP
+        """)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        pending = 0
+        staged = 0
+        for line_no, row in enumerate(reader, start=2):
+            stats["read"] += 1
+            error = validate_row(row)
+            if error:
+                errors.writerow([line_no] + row + [error])
+                stats["rejected"] += 1
+                continue
+            date, title, amount, currency, category, description = row
+            # Порожні поля у CSV-форматі COPY стають NULL (як у сидах без валюти)
+            writer.writerow([line_no, date, title, amount, currency.upper(),
+                             category.strip(), description])
+            pending += 1
+            if pending >= batch_size:
+                _copy_batch(cursor, buffer)
+                staged += pending
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                pending = 0
+        if pending:
+            _copy_batch(cursor, buffer)
+            staged += pending
+
+        # Категорії зіставляються з id одним запитом для всього файлу
+        if create_categories:
+            cursor.execute("""
+                INSERT INTO categories (name)
+                SELECT DISTINCT category FROM import_staging
+                ON CONFLICT (name) DO NOTHING
+            """)
+        cursor.execute("""
+            INSERT INTO expenses (title, date, category_id, amount, description, currency)
+            SELECT s.title, s.date, c.id, s.amount, s.description, s.currency
+            FROM import_staging s
+            JOIN categories c ON c.name = s.category AND c.is_deleted = FALSE
+            ORDER BY s.line_no
+        """)
+        stats["imported"] = cursor.rowcount
+
+        # Рядки з невідомою або видаленою категорією теж потрапляють у файл помилок
+        if stats["imported"] < staged:
+            err_file = errors.open()
+            err_file.flush()
+            cursor.copy_expert("""
+                COPY (
+                    SELECT s.line_no, s.date, s.title, s.amount, s.currency, s.category,
+                           s.description, 'Категорія не існує або видалена'
+                    FROM import_staging s
+                    WHERE NOT EXISTS (SELECT 1 FROM categories c
+                                      WHERE c.name = s.category AND c.is_deleted = FALSE)
+                    ORDER BY s.line_no
+                ) TO STDOUT WITH (FORMAT csv)
+            """, err_file)
+            stats["rejected"] += staged - stats["imported"]
+    if create_categories:
+        categories.invalidate()
+
+    # Файл помилок попереднього запуску не повинен лишатися поруч з успішним імпортом
+    if not stats["rejected"] and os.path.exists(errors_path):
+        os.remove(errors_path)
+    return stats
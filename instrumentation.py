@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import time
+import hashlib
+import datetime
+import threading
+import functools
+import contextvars
+
+# Налаштування через .env: поріг повільного запиту, файли журналів, EXPLAIN
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "logs/slow_queries.jsonl")
+# Журнал усіх запитів (порожнє значення — вимкнено)
+QUERY_LOG = os.getenv("QUERY_LOG", "")
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+# Куди інтерактивне меню пише гістограми по діях при виході
+HISTOGRAM_LOG = os.getenv("HISTOGRAM_LOG", "logs/query_histograms.jsonl")
+
+# Межі кошиків гістограми у мілісекундах (останній кошик — "більше")
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+_current_action = contextvars.ContextVar("current_action", default="other")
+_lock = threading.Lock()
+_histograms = {}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    # Прибирає літерали та параметри, щоб однакові за формою запити мали один відбиток
+    text = _STRING.sub("?", query)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("(?)", text)
+    return _SPACES.sub(" ", text).strip().lower()
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    normalized = normalize_query(query)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized
+
+
+def current_action():
+    return _current_action.get()
+
+
+def action(func):
+    # Декоратор для пунктів меню: усі запити всередині потрапляють у гістограму цієї дії
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_action.set(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_action.reset(token)
+    return wrapper
+
+
+def _write(path, record):
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _observe(name, elapsed_ms):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                        "buckets": [0] * (len(BUCKETS_MS) + 1)}
+        hist["count"] += 1
+        hist["total_ms"] += elapsed_ms
+        hist["max_ms"] = max(hist["max_ms"], elapsed_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                hist["buckets"][i] += 1
+                break
+        else:
+            hist["buckets"][-1] += 1
+
+
+_WRITE_WORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b")
+
+
+def is_read_only(query):
+    # Також відсікає SELECT ... FOR UPDATE, який не можна виконати на репліці
+    upper = query.upper()
+    return upper.lstrip().startswith(("SELECT", "WITH")) and not _WRITE_WORDS.search(upper)
+
+
+def explain(cursor, query, params):
+    # EXPLAIN ANALYZE повторно виконує запит, тому знімаємо план лише для читання
+    if not is_read_only(query):
+        return None
+    try:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+        return cursor.fetchone()[0]
+    except Exception as e:
+        return f"explain failed: {e}"
+
+
+def record_query(query, acquire_ms, execute_ms, rows, error=None, cursor=None, params=None):
+    # Один запис на запит: час отримання з'єднання, виконання, кількість рядків
+    fp, normalized = fingerprint(query)
+    total_ms = acquire_ms + execute_ms
+    action_name = current_action()
+    _observe(action_name, total_ms)
+
+    record = {
+        "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "event": "query",
+        "action": action_name,
+        "fingerprint": fp,
+        "query": normalized,
+        "acquire_ms": round(acquire_ms, 3),
+        "execute_ms": round(execute_ms, 3),
+        "rows": rows,
+    }
+    if error is not None:
+        record["error"] = str(error)
+    _write(QUERY_LOG, record)
+
+    if total_ms >= SLOW_QUERY_MS:
+        record = dict(record, event="slow_query")
+        if SLOW_QUERY_EXPLAIN and cursor is not None and error is None:
+            record["plan"] = explain(cursor, query, params)
+        _write(SLOW_QUERY_LOG, record)
+
+
+class Timer:
+    # Простий секундомір у мілісекундах
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def lap(self):
+        now = time.perf_counter()
+        elapsed = (now - self.started) * 1000
+        self.started = now
+        return elapsed
+
+
+def histograms():
+    with _lock:
+        return {name: dict(hist, buckets=list(hist["buckets"])) for name, hist in _histograms.items()}
+
+
+def dump_histograms(path=None):
+    # Знімок гістограм по діях у форматі JSON lines в окремий файл (не в журнал повільних запитів)
+    path = path or HISTOGRAM_LOG
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")
+    for name, hist in histograms().items():
+        _write(path, {"ts": now, "event": "histogram", "action": name,
+                      "bounds_ms": BUCKETS_MS, **hist})
@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import contextlib
+
+from bench import percentile
+
+# Навантажувальний тест: N імітованих користувачів (потоки) протягом заданого часу виконують
+# суміш операцій — додавання, редагування, пошук і звіти — через ті самі функції, що й меню.
+# Рівні навантаження (кількість користувачів) запускаються по черзі, щоб знайти точку,
+# після якої пропускна здатність перестає рости, а затримки й помилки — різко зростають.
+# Працює з окремою базою (LOADTEST_DB_NAME), бо додає й змінює витрати.
+
+OPERATIONS = ["insert", "update", "search", "report"]
+DEFAULT_MIX = "insert=20,update=10,search=40,report=30"
+SEARCH_WORDS = ["Сільпо", "Таксі", "Кіно", "Аптека", "Книга", "Оплата", "а"]
+REPORTS = ["total", "totals_by_category", "max_min_by_category", "extreme_in_period",
+           "average_daily", "top_category"]
+PERIOD_DAYS = 30
+
+# Стан з'єднань бази під час тесту; тривалість очікування блокування — від початку запиту
+ACTIVITY_SQL = """
+    SELECT COUNT(*),
+           COUNT(*) FILTER (WHERE state = 'active'),
+           COUNT(*) FILTER (WHERE state = 'idle in transaction'),
+           COUNT(*) FILTER (WHERE wait_event_type = 'Lock'),
+           COALESCE(MAX(EXTRACT(EPOCH FROM clock_timestamp() - query_start))
+                    FILTER (WHERE wait_event_type = 'Lock'), 0)
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid()
+"""
+DATABASE_STATS_SQL = """
+    SELECT xact_commit, xact_rollback, deadlocks FROM pg_stat_database WHERE datname = current_database()
+"""
+
+
+def parse_mix(text):
+    # "insert=20,search=40" -> [(операція, вага)]; операції з нульовою вагою не виконуються
+    mix = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Невідома операція: {name}")
+        weight = float(weight or 1)
+        if weight < 0:
+            raise ValueError(f"Від'ємна вага операції: {name}")
+        if weight:
+            mix.append((name, weight))
+    if not mix:
+        raise ValueError("Суміш операцій порожня.")
+    return mix
+
+
+def load_context(hot_rows):
+    # Дані, з якими працюють користувачі: категорії, діапазон id і дат наявних витрат
+    import repository
+    from database import execute_query
+
+    row = execute_query("""
+        SELECT MIN(id), MAX(id), MIN(date), MAX(date) FROM expenses WHERE is_deleted = FALSE
+    """, fetch_one=True)
+    categories = [(c.id, c.name) for c in repository.iter_categories()]
+    if not row or row[0] is None or not categories:
+        raise ValueError("У базі немає витрат або категорій: запустіть тест з --seed-rows.")
+    min_id, max_id, first_date, last_date = row
+    if hot_rows:
+        # Оновлення лише "гарячих" рядків — перевірка конкуренції за блокування
+        min_id = max(min_id, max_id - hot_rows + 1)
+    return {"min_id": min_id, "max_id": max_id, "categories": categories,
+            "first_date": first_date, "days": (last_date - first_date).days + 1}
+
+
+def _period(rng, context):
+    offset = rng.randrange(max(1, context["days"] - PERIOD_DAYS + 1))
+    start = context["first_date"] + datetime.timedelta(days=offset)
+    end = start + datetime.timedelta(days=PERIOD_DAYS - 1)
+    return start.isoformat(), end.isoformat()
+
+
+def op_insert(rng, context):
+    # Як пункт меню "Додати витрату": один INSERT підготовленим оператором
+    from database import execute_query, INSERT_EXPENSE_SQL
+    from generator import generate_expenses
+    row = next(generate_expenses(rng, 1, context["categories"], context["first_date"], context["days"]))
+    return execute_query(INSERT_EXPENSE_SQL, row, prepared=True) is not None
+
+
+def op_update(rng, context):
+    # Як пункт меню "Редагувати витрату": читання витрати, потім UPDATE усіх полів
+    import repository
+    from database import update_expenses
+    from models import from_cents
+    expense = repository.get_expense(rng.randint(context["min_id"], context["max_id"]), any_category=True)
+    if expense is None:
+        return True
+    amount = from_cents(max(1, expense.amount_cents + rng.randint(-500, 500)))
+    update_expenses([(expense.id, expense.title, expense.date, expense.category_id, amount,
+                      expense.description, expense.currency)])
+    return True
+
+
+def op_search(rng, context):
+    import repository
+    rows, _ = repository.search_page(rng.choice(SEARCH_WORDS), "", *_period(rng, context))
+    return rows is not None
+
+
+def op_report(rng, context):
+    import reports
+    name = rng.choice(REPORTS)
+    args = _period(rng, context) if name in ("extreme_in_period", "average_daily") else ()
+    return getattr(reports, name)(*args) is not None
+
+
+OPERATION_FUNCS = {"insert": op_insert, "update": op_update, "search": op_search, "report": op_report}
+
+
+class Recorder:
+    # Затримки й помилки по операціях з усіх потоків користувачів
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.errors = dict.fromkeys(OPERATIONS, 0)
+        self.exceptions = {}
+
+    def record(self, name, elapsed_ms, ok, exception=None):
+        with self._lock:
+            self.latencies[name].append(elapsed_ms)
+            if not ok:
+                self.errors[name] += 1
+            if exception is not None:
+                key = type(exception).__name__
+                self.exceptions[key] = self.exceptions.get(key, 0) + 1
+
+
+def _user(number, seed_value, mix, context, deadline, think_ms, recorder):
+    rng = random.Random(seed_value * 100003 + number)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            ok, error = OPERATION_FUNCS[name](rng, context), None
+        except Exception as e:
+            # execute_query сам перехоплює помилки БД; сюди доходять пакетні оновлення і PoolTimeout
+            ok, error = False, e
+        recorder.record(name, (time.perf_counter() - started) * 1000, ok, error)
+        if think_ms:
+            time.sleep(rng.expovariate(1000 / think_ms))
+
+
+class ActivityMonitor(threading.Thread):
+    # Окреме з'єднання поза пулом раз на interval секунд знімає pg_stat_activity
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        import psycopg2
+        from database import DB_CONFIG
+        conn = psycopg2.connect(**DB_CONFIG)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                while not self._done.wait(self.interval):
+                    cursor.execute(ACTIVITY_SQL)
+                    self.samples.append(cursor.fetchone())
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        columns = list(zip(*self.samples))
+        return {
+            "samples": len(self.samples),
+            "max_connections": max(columns[0]),
+            "max_active": max(columns[1]),
+            "max_idle_in_transaction": max(columns[2]),
+            "max_lock_waiters": max(columns[3]),
+            "avg_lock_waiters": round(sum(columns[3]) / len(self.samples), 2),
+            "max_lock_wait_ms": round(float(max(columns[4])) * 1000, 1),
+        }
+
+
+def database_stats():
+    from database import execute_query
+    row = execute_query(DATABASE_STATS_SQL, fetch_one=True)
+    return dict(zip(("commits", "rollbacks", "deadlocks"), row or (0, 0, 0)))
+
+
+def run_level(users, duration, mix, context, seed_value, think_ms, sample_interval):
+    # Один рівень навантаження: users потоків протягом duration секунд
+    from database import pool_stats
+
+    recorder = Recorder()
+    monitor = ActivityMonitor(sample_interval)
+    pool_before = pool_stats()
+    db_before = database_stats()
+    monitor.start()
+
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_user, args=(n, seed_value, mix, context, deadline, think_ms, recorder),
+                                daemon=True) for n in range(users)]
+    # Повідомлення "[Помилка БД]" з execute_query не потрібні у виводі — помилки рахує Recorder
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    monitor.stop()
+    pool_after = pool_stats()
+    db_after = database_stats()
+
+    operations = {}
+    for name in OPERATIONS:
+        latencies = recorder.latencies[name]
+        if not latencies:
+            continue
+        operations[name] = {
+            "count": len(latencies),
+            "errors": recorder.errors[name],
+            "ops_per_sec": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(max(latencies), 3),
+        }
+    count = sum(op["count"] for op in operations.values())
+    errors = sum(op["errors"] for op in operations.values())
+    return {
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "ops": count,
+        "ops_per_sec": round(count / elapsed, 1),
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "exceptions": recorder.exceptions,
+        "operations": operations,
+        # Лічильники пулу за рівень; size — відкриті з'єднання наприкінці
+        "pool": dict({key: pool_after[key] - pool_before[key]
+                      for key in ("checkouts", "waits", "connects", "reconnects")},
+                     size=pool_after["size"]),
+        "activity": monitor.summary(),
+        "database": {key: db_after[key] - db_before[key] for key in db_after},
+    }
+
+
+def breaking_point(levels, max_error_rate, p99_limit_ms, min_gain):
+    # Перший рівень, на якому система "ламається": забагато помилок, p99 понад ліміт або
+    # пропускна здатність зросла менше ніж на min_gain (частка) порівняно з найкращим рівнем
+    best = None
+    for level in levels:
+        reasons = []
+        if level["error_rate"] > max_error_rate:
+            reasons.append(f"помилки {level['error_rate']:.1%}")
+        slow = [name for name, op in level["operations"].items() if op["p99_ms"] > p99_limit_ms]
+        if slow:
+            reasons.append(f"p99 > {p99_limit_ms:g} мс: {', '.join(slow)}")
+        if best is not None and level["ops_per_sec"] < best * (1 + min_gain):
+            reasons.append(f"пропускна здатність не росте ({best} -> {level['ops_per_sec']} оп/с)")
+        if reasons:
+            return level["users"], reasons
+        best = max(best or 0, level["ops_per_sec"])
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Навантажувальний тест з імітацією користувачів")
+    parser.add_argument("--users", default="1,5,10,25,50", help="рівні навантаження через кому")
+    parser.add_argument("--duration", type=float, default=30, help="секунд на рівень")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="ваги операцій: " + ", ".join(OPERATIONS))
+    parser.add_argument("--think-ms", type=float, default=0, help="середня пауза між операціями користувача")
+    parser.add_argument("--hot-rows", type=int, default=0, help="оновлювати лише N останніх витрат (0 — усі)")
+    parser.add_argument("--pool-max", type=int, help="DB_POOL_MAX для тесту")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="секунд між знімками pg_stat_activity")
+    parser.add_argument("--db", default=os.getenv("LOADTEST_DB_NAME", "expenses_loadtest"))
+    parser.add_argument("--seed-rows", type=int, default=0, help="перезавантажити N витрат перед тестом")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--p99-limit-ms", type=float, default=1000)
+    parser.add_argument("--min-gain", type=float, default=0.05, help="мінімальний приріст оп/с між рівнями")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+        levels = [int(u) for u in args.users.split(",") if u.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    if not levels or min(levels) < 1:
+        parser.error("Кількість користувачів має бути додатною.")
+
+    # Налаштування читаються під час імпорту database/cache, тому задаються до нього
+    os.environ["DB_NAME"] = args.db
+    os.environ.setdefault("REPORT_CACHE_SIZE", "0")
+    if args.pool_max:
+        os.environ["DB_POOL_MAX"] = str(args.pool_max)
+    from migrations import init_db
+    if not init_db():
+        return 2
+
+    if args.seed_rows:
+        import generator
+        print(f"Завантаження {args.seed_rows} витрат...", flush=True)
+        generator.seed(50, args.seed_rows, args.seed, "2024-01-01", 730, replace=True)
+    try:
+        context = load_context(args.hot_rows)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    from database import POOL_CONFIG
+    report = {
+        "meta": {
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "duration": args.duration,
+            "mix": dict(mix),
+            "think_ms": args.think_ms,
+            "hot_rows": args.hot_rows,
+            "pool_max": POOL_CONFIG["max_size"],
+        },
+        "levels": [],
+    }
+    for users in levels:
+        level = run_level(users, args.duration, mix, context, args.seed, args.think_ms, args.sample_interval)
+        report["levels"].append(level)
+        activity = level["activity"]
+        print(f"[{users:>4} корист.] {level['ops_per_sec']:>9.1f} оп/с  помилки={level['errors']}  "
+              f"очікувань пулу={level['pool']['waits']}  з'єднань={activity.get('max_connections')}  "
+              f"блокувань={activity.get('max_lock_waiters')} (до {activity.get('max_lock_wait_ms')} мс)  "
+              f"deadlocks={level['database']['deadlocks']}", flush=True)
+        for name, op in level["operations"].items():
+            print(f"    {name:<8} {op['ops_per_sec']:>9.1f} оп/с  p50={op['p50_ms']:>9.2f}  "
+                  f"p95={op['p95_ms']:>9.2f}  p99={op['p99_ms']:>9.2f} мс  помилки={op['errors']}", flush=True)
+
+    point = breaking_point(report["levels"], args.max_error_rate, args.p99_limit_ms, args.min_gain)
+    report["breaking_point"] = point and {"users": point[0], "reasons": point[1]}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Результати збережено в {args.output}.")
+
+    if point:
+        print(f"Система не витримує з {point[0]} користувачів: {'; '.join(point[1])}.")
+    else:
+        print("Усі рівні навантаження пройдено без ознак насичення.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
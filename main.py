@@ -1,8 +1,17 @@
 import os
-import csv
-import datetime
-from database import init_db, execute_query
+import atexit
+from database import execute_query, transaction, update_expenses, DELETE_CATEGORY_SQL, INSERT_EXPENSE_SQL
+from migrations import init_db
+from importer import import_csv
+from exporter import export_expenses, EXPORT_PATH
+from rollup import rebuild_rollup
+from sketches import rebuild_sketches
+from generator import seed
 from utils import validate_date, validate_amount, validate_id
+from instrumentation import action, dump_histograms
+from cache import categories
+import reports
+import repository
 
 # Секція звітів
 def report_menu():
@@ -16,6 +25,7 @@ def report_menu():
         print("5. Середні витрати на день")
         print("6. Розширений пошук (назва, період, категорія)")
         print("7. Експорт звітів у CSV")
+        print("8. Розподіл сум по категоріях (медіана, p90, p99)")
         print("0. Повернутися до головного меню")
 
         choice = input("Оберіть: ")
@@ -34,6 +44,8 @@ def report_menu():
             search_expenses()
         elif choice == "7":
             export_csv()
+        elif choice == "8":
+            report_distribution()
         elif choice == "0":
             break
         else:
@@ -49,6 +61,8 @@ def main_menu():
         print("2. Витрати")
         print("3. Звіти")
         print("4. Заповнити тестовими даними (Seed)")
+        print("5. Імпорт витрат з CSV")
+        print("6. Перебудувати зведену таблицю звітів")
         print("0. Вихід")
 
         choice = input("Оберіть: ")
@@ -61,6 +75,12 @@ def main_menu():
             report_menu()
         elif choice == "4":
             seed_data()
+        elif choice == "5":
+            import_expenses()
+        elif choice == "6":
+            rows = rebuild_rollup()
+            buckets = rebuild_sketches()
+            print(f"Зведення перебудовано ({rows} груп, {buckets} кошиків скетчів).")
         elif choice == "0":
             break
         else:
@@ -68,6 +88,7 @@ def main_menu():
     return True
 
 # Керування категоріями (CRUD)
+@action
 def category_menu():
     # Меню для додавання, перегляду та редагування категорій
     while True:
@@ -86,11 +107,12 @@ def category_menu():
                 print("Назва не може бути порожньою.")
                 continue
             execute_query("INSERT INTO categories (name) VALUES (%s)", (name,))
+            categories.invalidate()
             print("Додано.")
 
         elif choice == "2":
             # Сортування за ID для зручності вибору
-            data = execute_query("SELECT id, name FROM categories WHERE is_deleted = FALSE ORDER BY id", fetch=True)
+            data = categories.all()
             if not data:
                 print("Категорій немає.")
             else:
@@ -101,27 +123,31 @@ def category_menu():
             if not validate_id(cat_id):
                 print("Невірний ID.")
                 continue
-            exists = execute_query("SELECT id FROM categories WHERE id=%s AND is_deleted=FALSE", (cat_id,),
-                                   fetch_one=True)
-            if not exists:
+            if not categories.exists(cat_id):
                 print("Не існує.")
                 continue
             new_name = input("Нова назва: ")
             execute_query("UPDATE categories SET name=%s WHERE id=%s", (new_name, cat_id))
+            categories.invalidate()
             print("Оновлено.")
 
         elif choice == "4":
             cat_id = input("ID категорії для видалення: ")
             if validate_id(cat_id):
-                # Перевіряємо наявність витрат перед видаленням
-                has_expenses = execute_query(
-                    "SELECT 1 FROM expenses WHERE category_id=%s AND is_deleted=FALSE",
-                    (cat_id,), fetch_one=True
-                )
+                # Перевірка наявності витрат і видалення — один атомарний запит
+                try:
+                    with transaction() as cursor:
+                        cursor.execute(DELETE_CATEGORY_SQL, (cat_id,))
+                        has_expenses, deleted = cursor.fetchone()
+                except Exception as e:
+                    print("\n[Помилка БД]:", e)
+                    continue
                 if has_expenses:
                     print("ПОМИЛКА: Не можна видалити категорію, поки в ній є активні витрати!")
+                elif not deleted:
+                    print("Не існує.")
                 else:
-                    execute_query("UPDATE categories SET is_deleted=TRUE WHERE id=%s", (cat_id,))
+                    categories.invalidate()
                     print("Категорію видалено.")
         elif choice == "0":
             break
@@ -157,9 +183,10 @@ def expense_menu():
     return True
 
 
+@action
 def add_expense():
     # Вибір категорії (існуюча логіка)
-    cats = execute_query("SELECT id, name FROM categories WHERE is_deleted=FALSE ORDER BY id", fetch=True)
+    cats = categories.all()
     if not cats:
         print("Спочатку створіть категорію.")
         return None
@@ -170,8 +197,7 @@ def add_expense():
         print("Невірний ID.")
         return None
 
-    exists = execute_query("SELECT id FROM categories WHERE id=%s AND is_deleted=FALSE", (cat_id,), fetch_one=True)
-    if not exists:
+    if not categories.exists(cat_id):
         print("Категорія не існує.")
         return None
 
@@ -189,90 +215,99 @@ def add_expense():
 
     # Валідація та запис у БД
     if validate_date(date) and validate_amount(amount):
-        execute_query("""
-            INSERT INTO expenses (title, date, category_id, amount, description, currency) 
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (title, date, cat_id, amount, description, currency))
+        # Частий запит: виконується як підготовлений оператор (PREPARE/EXECUTE)
+        if not execute_query(INSERT_EXPENSE_SQL, (title, date, cat_id, amount, description, currency),
+                             prepared=True):
+            return None
         print(f"Витрату додано ({currency}).")
     else:
         print("Помилка даних (перевірте формат дати та суму).")
     return True
 
+def browse_pages(fetch, key, render):
+    # Посторінковий перегляд з навігацією далі/назад; key(row) повертає ключ сторінки.
+    # fetch може повертати ітератор, тому ключі крайніх рядків запам'ятовуються під час виводу
+    after = before = None
+    first = True
+    while True:
+        rows, has_more = fetch(after=after, before=before)
+        first_key = last_key = None
+        for row in rows or []:
+            last_key = key(row)
+            if first_key is None:
+                first_key = last_key
+            render(row)
+        if first_key is None:
+            if first:
+                return None
+            print("Більше записів немає.")
+            return True
+        first = False
+
+        # has_more стосується лише напрямку, в якому ми щойно рухались
+        has_next = has_more if before is None else True
+        has_prev = after is not None if before is None else has_more
+        if not (has_next or has_prev):
+            return True
+        hints = []
+        if has_next: hints.append("[n] далі")
+        if has_prev: hints.append("[p] назад")
+        choice = input(", ".join(hints) + ", [Enter] вихід: ").strip().lower()
+        if choice == "n" and has_next:
+            after, before = last_key, None
+        elif choice == "p" and has_prev:
+            after, before = None, first_key
+        else:
+            return True
+
+@action
 def list_expenses():
-    data = execute_query("""
-        SELECT e.id, e.title, e.date, c.name, e.amount, e.currency 
-        FROM expenses e JOIN categories c ON e.category_id = c.id 
-        WHERE e.is_deleted=FALSE ORDER BY e.id
-    """, fetch=True)
-    if not data:
+    # Виводимо суму разом з валютою
+    shown = browse_pages(repository.expenses_page, lambda e: (e.id,),
+                         lambda e: print(f"ID: {e.id} | {e.title} | {e.date} | {e.category} | {e.amount_text} {e.currency}"))
+    if shown is None:
         print("Витрат немає.")
-    else:
-        # Виводимо суму разом з валютою
-        for row in data:
-            print(f"ID: {row[0]} | {row[1]} | {row[2]} | {row[3]} | {row[4]} {row[5]}")
-    return data
+    return shown
 
+@action
 def show_expense_details():
     exp_id = input("ID витрати: ")
     if not validate_id(exp_id):
         return None
 
-    # Додаємо e.currency та e.description у SQL-запит
-    data = execute_query("""
-        SELECT e.id, e.title, e.date, c.name, e.amount, e.currency, e.description 
-        FROM expenses e 
-        JOIN categories c ON e.category_id = c.id 
-        WHERE e.id=%s AND e.is_deleted=FALSE
-    """, (exp_id,), fetch_one=True)
-
-    if not data:
+    expense = repository.get_expense(exp_id)
+    if not expense:
         print("Не знайдено.")
         return None
     else:
-        print(f"\n--- ДЕТАЛІ ВИТРАТИ ID:{data[0]} ---")
-        print(f"Назва: {data[1]}")
-        print(f"Дата: {data[2]}")
-        print(f"Категорія: {data[3]}")
-        print(f"Сума: {data[4]} {data[5]}")  # Вивід суми разом з валютою
-        print(f"Опис: {data[6] if data[6] else '—'}")  # Повний опис або прочерк
+        print(f"\n--- ДЕТАЛІ ВИТРАТИ ID:{expense.id} ---")
+        print(f"Назва: {expense.title}")
+        print(f"Дата: {expense.date}")
+        print(f"Категорія: {expense.category}")
+        print(f"Сума: {expense.amount_text} {expense.currency}")  # Вивід суми разом з валютою
+        print(f"Опис: {expense.description or '—'}")  # Повний опис або прочерк
         return True
 
+@action
 def search_expenses():
     print("\n--- Розширений пошук (залиште порожнім, щоб ігнорувати параметр) ---")
-    title_part = input("Назва (частковий збіг): ").strip()
+    text = input("Текст у назві чи описі: ").strip()
     cat_name = input("Назва категорії: ").strip()
     start_date = input("Початок періоду (YYYY-MM-DD): ").strip()
     end_date = input("Кінець періоду (YYYY-MM-DD): ").strip()
 
-    query = """
-        SELECT e.id, e.title, e.date, c.name, e.amount, e.currency, e.description 
-        FROM expenses e 
-        JOIN categories c ON e.category_id = c.id 
-        WHERE e.is_deleted = FALSE
-    """
-    params = []
-
-    if title_part:
-        query += " AND e.title ILIKE %s"
-        params.append(f"%{title_part}%")
-    if cat_name:
-        query += " AND c.name ILIKE %s"
-        params.append(f"%{cat_name}%")
-    if start_date and validate_date(start_date):
-        query += " AND e.date >= %s"
-        params.append(start_date)
-    if end_date and validate_date(end_date):
-        query += " AND e.date <= %s"
-        params.append(end_date)
-
-    results = execute_query(query, tuple(params), fetch=True)
-    if not results:
+    def fetch(after=None, before=None):
+        return repository.search_page(text, cat_name, start_date, end_date, after, before)
+
+    def render(item):
+        e = item[0]
+        desc = f" | Опис: {e.description}" if e.description else ""
+        print(f"[{e.date}] {e.title} ({e.category}) - {e.amount_text} {e.currency}{desc}")
+
+    if browse_pages(fetch, lambda item: item[1], render) is None:
         print("Нічого не знайдено.")
-    else:
-        for r in results:
-            desc = f" | Опис: {r[6]}" if r[6] else ""
-            print(f"[{r[2]}] {r[1]} ({r[3]}) - {r[4]} {r[5]}{desc}")
 
+@action
 def update_expense():
     # Редагування існуючої витрати, включаючи нові поля та зміну категорії
     exp_id = input("ID витрати: ")
@@ -281,60 +316,61 @@ def update_expense():
         return None
 
     # Перевіряємо, чи існує така витрата
-    exists = execute_query(
-        "SELECT id, category_id, title, date, amount, description, currency FROM expenses WHERE id=%s AND is_deleted=FALSE",
-        (exp_id,), fetch_one=True)
-    if not exists:
+    expense = repository.get_expense(exp_id, any_category=True)
+    if not expense:
         print("Витрату з таким ID не знайдено.")
         return None
 
-    print(f"\nПоточні дані: {exists}")
+    print(f"\nПоточні дані: {expense}")
     print("--- Залиште порожнім, щоб не змінювати ---")
 
     # Зміна категорії
-    new_cat_id = input(f"Новий ID категорії (поточний {exists[1]}): ").strip()
+    new_cat_id = input(f"Новий ID категорії (поточний {expense.category_id}): ").strip()
     if new_cat_id:
-        if not validate_id(new_cat_id) or not execute_query(
-                "SELECT id FROM categories WHERE id=%s AND is_deleted=FALSE", (new_cat_id,), fetch_one=True):
+        if not validate_id(new_cat_id) or not categories.exists(new_cat_id):
             print("Помилка: такої категорії не існує.")
             return None
     else:
-        new_cat_id = exists[1]
+        new_cat_id = expense.category_id
 
     # Редагування назви, дати та суми
-    new_title = input(f"Нова назва (поточна '{exists[2]}'): ").strip() or exists[2]
+    new_title = input(f"Нова назва (поточна '{expense.title}'): ").strip() or expense.title
 
-    new_date = input(f"Нова дата YYYY-MM-DD (поточна {exists[3]}): ").strip() or str(exists[3])
+    new_date = input(f"Нова дата YYYY-MM-DD (поточна {expense.date}): ").strip() or str(expense.date)
     if not validate_date(new_date):
         print("Невірний формат дати.")
         return None
 
-    new_amount = input(f"Нова сума (поточна {exists[4]}): ").strip() or str(exists[4])
+    new_amount = input(f"Нова сума (поточна {expense.amount_text}): ").strip() or expense.amount_text
     if not validate_amount(new_amount):
         print("Сума має бути додатним числом.")
         return None
 
     # Редагування опису та валюти
-    new_description = input(f"Новий опис (поточний '{exists[5]}'): ").strip()
+    new_description = input(f"Новий опис (поточний '{expense.description}'): ").strip()
     # Якщо нічого не ввели — залишаємо старий, якщо ввели "0" або "none" — очищуємо (NULL)
     if not new_description:
-        new_description = exists[5]
+        new_description = expense.description
     elif new_description.lower() in ['clear', 'none', '-']:
         new_description = None
 
-    new_currency = input(f"Нова валюта (поточна {exists[6]}): ").strip().upper() or exists[6]
+    new_currency = input(f"Нова валюта (поточна {expense.currency}): ").strip().upper() or expense.currency
 
     # Виконання оновлення в БД
-    success = execute_query("""
-        UPDATE expenses 
-        SET category_id=%s, title=%s, date=%s, amount=%s, description=%s, currency=%s 
-        WHERE id=%s
-    """, (new_cat_id, new_title, new_date, new_amount, new_description, new_currency, exp_id))
+    try:
+        updated = update_expenses([(exp_id, new_title, new_date, new_cat_id, new_amount,
+                                    new_description, new_currency)])
+    except Exception as e:
+        print("\n[Помилка БД]:", e)
+        return None
 
-    if success:
+    if updated:
         print("Дані успішно оновлено!")
+    else:
+        print("Витрату вже видалено.")
     return True
 
+@action
 def delete_expense():
     #Логічне видалення витрати (прапорець is_deleted)
     exp_id = input("ID: ")
@@ -344,30 +380,21 @@ def delete_expense():
     return True
 
 # Логіка експорту за звітів
+@action
 def report_total():
     print("\n--- ЗАГАЛЬНА СУМА ВИТРАТ ---")
     # Групуємо за валютою, щоб не додавати долари до гривень
-    data = execute_query("""
-        SELECT currency, SUM(amount) FROM expenses 
-        WHERE is_deleted=FALSE GROUP BY currency
-    """, fetch=True)
+    data = reports.total()
     if not data:
         print("Витрат немає.")
     else:
         for row in data:
             print(f"Всього у {row[0]}: {row[1]:.2f}")
 
+@action
 def report_totals_by_category():
     print("\n--- ПІДСУМКИ ПО КАТЕГОРІЯХ (ЗА ВАЛЮТАМИ) ---")
-    query = """
-        SELECT c.name, e.currency, SUM(e.amount)
-        FROM expenses e
-        JOIN categories c ON e.category_id = c.id
-        WHERE e.is_deleted = FALSE
-        GROUP BY c.name, e.currency
-        ORDER BY c.name
-    """
-    results = execute_query(query, fetch=True)
+    results = reports.totals_by_category()
     if not results:
         print("Дані відсутні.")
     else:
@@ -376,17 +403,11 @@ def report_totals_by_category():
         for r in results:
             print(f"{r[0]:<20} | {r[2]:>10.2f} | {r[1]}")
 
+@action
 def report_max_min_by_category():
     # Макс/Мін у кожній категорії
     print("\n--- Максимальні та мінімальні витрати по категоріях ---")
-    query = """
-        SELECT c.name, MAX(e.amount), MIN(e.amount), COUNT(e.id)
-        FROM expenses e
-        JOIN categories c ON e.category_id = c.id
-        WHERE e.is_deleted = FALSE
-        GROUP BY c.name
-    """
-    results = execute_query(query, fetch=True)
+    results = reports.max_min_by_category()
     if not results:
         print("Дані відсутні.")
     else:
@@ -395,56 +416,53 @@ def report_max_min_by_category():
         for r in results:
             print(f"{r[0]:<20} | {r[1]:<10} | {r[2]:<10} | {r[3]}")
 
-def report_extreme_in_period():
-    # Макс/Мін у періоді
-    start = input("З якої дати (YYYY-MM-DD): ")
-    end = input("По яку дату (YYYY-MM-DD): ")
+@action
+def report_extreme_in_period(start=None, end=None):
+    # Макс/Мін у періоді (дати запитуються, якщо не передані явно)
+    if start is None:
+        start = input("З якої дати (YYYY-MM-DD): ")
+    if end is None:
+        end = input("По яку дату (YYYY-MM-DD): ")
     if not (validate_date(start) and validate_date(end)):
         print("Невірний формат дат.")
         return
-    max_exp = execute_query("SELECT title, amount, currency, date FROM expenses WHERE is_deleted=FALSE AND date BETWEEN %s AND %s ORDER BY amount DESC LIMIT 1", (start, end), fetch_one=True)
-    min_exp = execute_query("SELECT title, amount, currency, date FROM expenses WHERE is_deleted=FALSE AND date BETWEEN %s AND %s ORDER BY amount ASC LIMIT 1", (start, end), fetch_one=True)
+    result = reports.extreme_in_period(start, end)
+    if result is None:
+        return
+    max_exp, min_exp = result
     if max_exp:
         print(f"\nНайдорожча: {max_exp[0]} ({max_exp[1]} {max_exp[2]}) від {max_exp[3]}")
         print(f"Найдешевша: {min_exp[0]} ({min_exp[1]} {min_exp[2]}) від {min_exp[3]}")
     else: print("Витрат не знайдено.")
 
 
-def report_average_daily():
+@action
+def report_average_daily(start=None, end=None):
     # Середні витрати на день за період з урахуванням різних валют
-    start = input("З якої дати (YYYY-MM-DD): ")
-    end = input("По яку дату (YYYY-MM-DD): ")
+    if start is None:
+        start = input("З якої дати (YYYY-MM-DD): ")
+    if end is None:
+        end = input("По яку дату (YYYY-MM-DD): ")
 
     if not (validate_date(start) and validate_date(end)):
         print("Невірний формат дат.")
         return None
 
     # Розраховуємо кількість днів у періоді
-    d1 = datetime.datetime.strptime(start, "%Y-%m-%d")
-    d2 = datetime.datetime.strptime(end, "%Y-%m-%d")
-    days_count = (d2 - d1).days + 1
+    days_count = reports.days_in_period(start, end)
 
     if days_count <= 0:
         print("Помилка: Кінцева дата має бути більшою за початкову.")
         return None
 
-    # Отримуємо суми, згруповані за валютою (GROUP BY)
-    results = execute_query("""
-        SELECT currency, COALESCE(SUM(amount), 0) 
-        FROM expenses 
-        WHERE is_deleted=FALSE AND date BETWEEN %s AND %s
-        GROUP BY currency
-    """, (start, end), fetch=True)
+    results = reports.average_daily(start, end)
 
     if not results:
         print("\nВитрат за цей період не знайдено.")
         return None
 
     print(f"\n--- Аналіз періоду ({days_count} днів) ---")
-    for row in results:
-        curr = row[0]
-        total_in_curr = float(row[1])
-        average = total_in_curr / days_count
+    for curr, total_in_curr, average in results:
         print(f"Валюта: {curr}")
         print(f"  Загальна сума: {total_in_curr:.2f} {curr}")
         print(f"  Середні витрати на день: {average:.2f} {curr}")
@@ -452,83 +470,104 @@ def report_average_daily():
     print("\nПримітка: Розрахунок проведено окремо для кожної валюти.")
     return True
 
+@action
 def report_top_category():
     print("\n--- ТОП-КАТЕГОРІЇ ЗА ВАЛЮТАМИ ---")
-    query = """
-        SELECT c.name, SUM(e.amount) as total, e.currency
-        FROM expenses e JOIN categories c ON e.category_id = c.id
-        WHERE e.is_deleted = FALSE 
-        GROUP BY c.name, e.currency
-        ORDER BY total DESC
-    """
-    results = execute_query(query, fetch=True)
-    if results:
-        # Показуємо лідера для кожної валюти
-        seen_currencies = set()
-        for r in results:
-            if r[2] not in seen_currencies:
-                print(f"Топ у {r[2]}: '{r[0]}' ({r[1]:.2f})")
-                seen_currencies.add(r[2])
+    # Показуємо лідера для кожної валюти
+    for currency, name, total in reports.top_category() or []:
+        print(f"Топ у {currency}: '{name}' ({total:.2f})")
 
 
-def export_csv():
-    data = execute_query("""
-        SELECT e.date, e.title, e.amount, e.currency, c.name, e.description 
-        FROM expenses e JOIN categories c ON e.category_id = c.id 
-        WHERE e.is_deleted=FALSE
-    """, fetch=True)
+@action
+def report_distribution():
+    # Перцентилі сум за місячними скетчами; порожні дати — за весь час
+    start = input("З якої дати (YYYY-MM-DD, Enter — весь час): ").strip()
+    end = input("По яку дату (YYYY-MM-DD, Enter — весь час): ").strip() if start else ""
+    if start and not (validate_date(start) and validate_date(end)):
+        print("Невірний формат дат.")
+        return None
+    if start and reports.days_in_period(start, end) <= 0:
+        print("Помилка: Кінцева дата має бути не раніше за початкову.")
+        return None
 
-    if not data:
-        return None  # Тут все ок
+    results = reports.distribution(start or None, end or None)
+    if not results:
+        print("Дані відсутні.")
+        return None
+    print("\n--- Розподіл сум витрат (оцінка за місячними скетчами) ---")
+    print(f"{'Категорія':<20} | {'Валюта':<6} | {'К-сть':<7} | {'Медіана':<10} | {'p90':<10} | {'p99'}")
+    print("-" * 80)
+    for name, currency, count, p50, p90, p99 in results:
+        print(f"{name:<20} | {currency or '-':<6} | {count:<7} | {p50:<10} | {p90:<10} | {p99}")
+    return True
+
+
+@action
+def export_csv():
+    # Потоковий експорт (COPY TO STDOUT) з необов'язковими фільтрами
+    print("\n--- Експорт у CSV (залиште порожнім, щоб ігнорувати параметр) ---")
+    date_from = input("Початок періоду (YYYY-MM-DD): ").strip()
+    date_to = input("Кінець періоду (YYYY-MM-DD): ").strip()
+    if (date_from and not validate_date(date_from)) or (date_to and not validate_date(date_to)):
+        print("Невірний формат дат.")
+        return None
+    category = input("Категорія: ").strip()
+    currency = input("Валюта: ").strip()
+    compress = input("Стиснути gzip? (y/N): ").strip().lower() == "y"
+
+    try:
+        path, rows = export_expenses(EXPORT_PATH, date_from or None, date_to or None,
+                                     category or None, currency or None, compress=compress)
+    except Exception as e:
+        print(f"[Помилка експорту]: {e}")
+        return None
 
-    os.makedirs("export", exist_ok=True)
-    with open("export/report.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Дата", "Назва", "Сума", "Валюта", "Категорія", "Опис"])
-        writer.writerows(data)
+    if rows is not None:
+        print(f"Експортовано рядків: {rows}.")
+    print(f"Збережено в {path}.")
+    return True
 
-    print("Збережено в export/report.csv.")
+@action
+def import_expenses():
+    # Масовий імпорт у форматі export/report.csv (обернена операція до export_csv)
+    path = input("Шлях до CSV (за замовчуванням export/report.csv): ").strip() or "export/report.csv"
+    if not os.path.exists(path):
+        print("Файл не знайдено.")
+        return None
+    try:
+        stats = import_csv(path)
+    except Exception as e:
+        print(f"[Помилка імпорту]: {e}")
+        return None
+    print(f"Прочитано: {stats['read']}, імпортовано: {stats['imported']}, відхилено: {stats['rejected']}.")
+    if stats["rejected"]:
+        print(f"Відхилені рядки збережено в {os.path.splitext(path)[0]}.errors.csv")
     return True
 
 # Системні функції (SEED DATA)
+@action
 def seed_data():
-    # Заповнення бази демонстраційними даними
-    categories = ["Продукти", "Транспорт", "Розваги", "Комунальні", "Здоров'я", "Освіта", "Інше"]
-    for cat in categories:
-        execute_query("INSERT INTO categories (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (cat,))
-
-    cat_rows = execute_query("SELECT id, name FROM categories WHERE is_deleted=FALSE ORDER BY id", fetch=True)
-    cat_map = {name: cat_id for cat_id, name in cat_rows}
-
-    # Структура: (Назва, Дата, ID Категорії, Сума, Опис, Валюта)
-    test_expenses = [
-        ("Сільпо", "2026-02-01", cat_map["Продукти"], 850.50, "Закупівля на тиждень", "UAH"),
-        ("WOG Паливо", "2026-02-02", cat_map["Транспорт"], 1200.00, None, "UAH"),
-        ("Спортзал", "2026-02-03", cat_map["Здоров'я"], 1500.00, "Абонемент на місяць", "UAH"),
-        ("Кіно", "2026-02-05", cat_map["Розваги"], 400.00, "Квитки на вечірній сеанс", None),
-        ("Інтернет", "2026-02-07", cat_map["Комунальні"], 350.00, None, "UAH"),
-        ("Курс Python (Освіта)", "2026-02-10", cat_map["Освіта"], 5000.00, "Оплата за модуль", "UAH"),
-        ("Аптека", "2026-02-12", cat_map["Здоров'я"], 320.00, "Вітаміни", None),
-        ("Таксі Bolt", "2026-02-14", cat_map["Транспорт"], 180.00, None, "UAH"),
-        ("Вечеря", "2026-02-15", cat_map["Розваги"], 750.00, "Зустріч з друзями", "UAH"),
-        ("Овочі", "2026-02-18", cat_map["Продукти"], 420.00, "Ринок", "UAH"),
-        ("Електроенергія", "2026-02-20", cat_map["Комунальні"], 980.00, "За січень", "UAH"),
-        ("Подарунок", "2026-02-22", cat_map["Інше"], 600.00, "Механічна клавіатура", "UAH"),
-        ("Метро", "2026-02-23", cat_map["Транспорт"], 200.00, "Поповнення смарт-картки", "UAH"),
-        ("Книга по Blender", "2026-02-24", cat_map["Освіта"], 550.00, "Довідник по композиції", "UAH")
-    ]
-
-    for t, d, c, a, desc, curr in test_expenses:
-        execute_query("""
-            INSERT INTO expenses (title, date, category_id, amount, description, currency) 
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (t, d, c, a, desc, curr))
-
-    print("\n[УСПІХ]: Дані додано.")
+    # Заповнення бази синтетичними даними (генератор детермінований за seed)
+    category_count = input("Кількість категорій (за замовчуванням 7): ").strip() or "7"
+    expense_count = input("Кількість витрат (за замовчуванням 14): ").strip() or "14"
+    seed_value = input("Seed (за замовчуванням 42): ").strip() or "42"
+    if not (validate_id(category_count) and validate_id(expense_count) and seed_value.isdigit()):
+        print("Помилка: очікуються додатні цілі числа.")
+        return None
+    replace = input("Очистити наявні витрати перед заповненням? (y/N): ").strip().lower() == "y"
+
+    try:
+        cats, rows = seed(int(category_count), int(expense_count), int(seed_value), replace=replace)
+    except Exception as e:
+        print(f"[Помилка генерації]: {e}")
+        return None
+    print(f"\n[УСПІХ]: Дані додано (категорій: {cats}, витрат: {rows}).")
     return True
 
 
 if __name__ == "__main__":
-    # Ініціалізація бази даних та запуск головного меню
+    # Ініціалізація бази даних та запуск головного меню; гістограми по пунктах меню
+    # зберігаються лише для інтерактивної сесії
+    atexit.register(dump_histograms)
     init_db()
     main_menu()
\ No newline at end of file
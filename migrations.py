@@ -0,0 +1,117 @@
+import psycopg2
+from psycopg2 import errors
+from database import connection, create_database_if_not_exists, close_pool
+import rollup
+import compaction
+import reports
+import exporter
+import cache
+import sketches
+
+# Ключ advisory-блокування, щоб два процеси не застосовували міграції одночасно
+MIGRATION_LOCK_KEY = 721003
+
+# Список міграцій: (версія, опис, SQL). Нові міграції додаються лише в кінець.
+MIGRATIONS = [
+    (1, "Базові таблиці categories та expenses", """
+        CREATE TABLE IF NOT EXISTS categories (
+            id SERIAL PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            is_deleted BOOLEAN DEFAULT FALSE
+        );
+        CREATE TABLE IF NOT EXISTS expenses (
+            id SERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            date DATE NOT NULL,
+            category_id INTEGER REFERENCES categories(id),
+            amount DECIMAL(10,2) NOT NULL CHECK (amount > 0),
+            is_deleted BOOLEAN DEFAULT FALSE
+        );
+        ALTER TABLE expenses ADD COLUMN IF NOT EXISTS description TEXT;
+        ALTER TABLE expenses ADD COLUMN IF NOT EXISTS currency CHAR(3);
+    """),
+    (2, "Часткові індекси для звітів і пошуку", """
+        CREATE INDEX IF NOT EXISTS idx_expenses_date
+            ON expenses (date) WHERE is_deleted = FALSE;
+        CREATE INDEX IF NOT EXISTS idx_expenses_category
+            ON expenses (category_id) WHERE is_deleted = FALSE;
+        CREATE INDEX IF NOT EXISTS idx_expenses_currency_date
+            ON expenses (currency, date) WHERE is_deleted = FALSE;
+    """),
+    (3, "Щоденне зведення daily_rollup з тригерами", rollup.MIGRATION_SQL),
+    # Індекс (date, id) покриває і фільтри за датою, і keyset-пагінацію пошуку,
+    # тому окремий індекс лише за date більше не потрібен
+    (4, "Індекс (date, id) для пагінації", """
+        CREATE INDEX IF NOT EXISTS idx_expenses_date_id
+            ON expenses (date, id) WHERE is_deleted = FALSE;
+        DROP INDEX IF EXISTS idx_expenses_date;
+    """),
+    (5, "deleted_at і архівні таблиці для компакції", compaction.MIGRATION_SQL),
+    # Додавання генерованого стовпця перезаписує таблицю, тому міграція на великій базі триває довше
+    (6, "Повнотекстовий і триграмний пошук витрат", reports.SEARCH_MIGRATION_SQL),
+    (7, "updated_at для інкрементального експорту змін", exporter.CHANGES_MIGRATION_SQL),
+    (8, "Лічильники версій даних для кешу звітів", cache.DATA_VERSIONS_MIGRATION_SQL),
+    (9, "Місячні квантильні скетчі сум витрат", sketches.MIGRATION_SQL),
+    # Тригери зведення з блокуванням груп: паралельні правки однієї групи не конфліктують
+    (10, "Серіалізація оновлення daily_rollup по групах", rollup.FUNCTIONS_SQL),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version():
+    # Поточна версія схеми; 0 — якщо міграції ще не застосовувались
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute("SELECT MAX(version) FROM schema_version")
+            except errors.UndefinedTable:
+                return 0
+            return cursor.fetchone()[0] or 0
+
+
+def migrate():
+    # Застосовує всі відсутні міграції в одній транзакції, повертає список версій
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = cursor.fetchone()[0]
+
+            applied = []
+            for version, description, sql in MIGRATIONS:
+                if version <= current:
+                    continue
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                               (version, description))
+                applied.append(version)
+        conn.commit()
+    return applied
+
+
+def init_db():
+    # Швидкий шлях: якщо схема актуальна, старт коштує один запит до schema_version
+    try:
+        try:
+            if schema_version() >= LATEST_VERSION:
+                return True
+        except psycopg2.OperationalError:
+            # Робочої бази ще немає — створюємо її і пробуємо з'єднатися знову
+            close_pool()
+            create_database_if_not_exists()
+        applied = migrate()
+        if applied:
+            print(f"[СИСТЕМА]: Застосовано міграції: {', '.join(map(str, applied))}.")
+        print("[СИСТЕМА]: База даних успішно синхронізована.")
+        return True
+    except Exception as e:
+        print(f"[Помилка створення таблиць]: {e}")
+        return None
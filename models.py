@@ -0,0 +1,73 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Компактні об'єкти рядків замість кортежів psycopg2. __slots__ прибирає __dict__ з
+# кожного екземпляра, а сума зберігається цілим числом копійок: int займає кілька байтів
+# проти Decimal і не потребує повторного розбору у звітах.
+CENT = Decimal("0.01")
+# Межа для стовпця amount DECIMAL(10,2)
+MAX_AMOUNT = Decimal("99999999.99")
+
+
+def to_cents(amount):
+    # Decimal/рядок/число -> ціле число копійок (з округленням до копійки)
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    whole, part = divmod(abs(int(cents)), 100)
+    return f"{sign}{whole}.{part:02d}"
+
+
+class Category:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def __repr__(self):
+        return f"Category(id={self.id}, name={self.name!r})"
+
+
+class Expense:
+    __slots__ = ("id", "title", "date", "category_id", "category", "amount_cents", "currency", "description")
+
+    # Порядок стовпців, який очікує from_row (див. repository.EXPENSE_COLUMNS_SQL)
+    FIELDS = __slots__
+
+    def __init__(self, id, title, date, category_id, category, amount_cents, currency=None, description=None):
+        self.id = id
+        self.title = title
+        self.date = date
+        self.category_id = category_id
+        self.category = category
+        self.amount_cents = amount_cents
+        self.currency = currency
+        self.description = description
+
+    @classmethod
+    def from_row(cls, row):
+        # Фабрика рядка: кортеж у порядку FIELDS -> Expense
+        return cls(*row)
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    @property
+    def amount_text(self):
+        # Сума для виводу без створення Decimal
+        return format_cents(self.amount_cents)
+
+    def __repr__(self):
+        return (f"Expense(id={self.id}, title={self.title!r}, date={self.date}, "
+                f"amount={self.amount_text} {self.currency or ''})")
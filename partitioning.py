@@ -0,0 +1,176 @@
+import os
+import gzip
+import datetime
+from psycopg2 import sql
+from database import transaction, plain_columns
+
+# Необов'язкове секціонування expenses за місяцями (PARTITION BY RANGE (date)).
+# Секції називаються expenses_yYYYYmMM; рядки поза створеними секціями
+# потрапляють у expenses_default, доки для їхнього місяця не з'явиться секція.
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+DEFAULT_PARTITION = "expenses_default"
+ARCHIVE_DIR = "archive"
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"expenses_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('expenses')")
+    row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions(cursor):
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'expenses'::regclass
+        ORDER BY c.relname
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _create_partition(cursor, month):
+    # Створює секцію місяця; рядки цього місяця, що вже лежать у default-секції,
+    # переносяться в нову. DML напряму по секціях не запускає statement-тригери
+    # батьківської таблиці, тож зведення (daily_rollup) не змінюється.
+    name = partition_name(month)
+    lower, upper = month, add_months(month, 1)
+    columns = sql.SQL(", ").join(map(sql.Identifier, plain_columns(cursor, "expenses")))
+    cursor.execute(sql.SQL("""
+        CREATE TEMP TABLE partition_moved ON COMMIT DROP AS
+        SELECT {columns} FROM {default} WHERE date >= %s AND date < %s
+    """).format(columns=columns, default=sql.Identifier(DEFAULT_PARTITION)), (lower, upper))
+    moved = cursor.rowcount
+    if moved:
+        cursor.execute(sql.SQL("DELETE FROM {} WHERE date >= %s AND date < %s").format(
+            sql.Identifier(DEFAULT_PARTITION)), (lower, upper))
+    cursor.execute(sql.SQL("CREATE TABLE {} PARTITION OF expenses FOR VALUES FROM (%s) TO (%s)").format(
+        sql.Identifier(name)), (lower, upper))
+    if moved:
+        cursor.execute(sql.SQL("INSERT INTO {name} ({columns}) SELECT {columns} FROM partition_moved").format(
+            name=sql.Identifier(name), columns=columns))
+    cursor.execute("DROP TABLE partition_moved")
+    return name
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, today=None):
+    # Створює секції від поточного місяця на months_ahead наперед (для cron)
+    today = today or datetime.date.today()
+    created = []
+    with transaction() as cursor:
+        if not is_partitioned(cursor):
+            return created
+        existing = set(list_partitions(cursor))
+        for offset in range(months_ahead + 1):
+            month = add_months(month_start(today), offset)
+            if partition_name(month) not in existing:
+                created.append(_create_partition(cursor, month))
+    return created
+
+
+def convert_to_partitioned(months_ahead=MONTHS_AHEAD, keep_old=False):
+    # Переводить наявну таблицю expenses у секціоновану з перенесенням даних.
+    # Таблиця блокується (ACCESS EXCLUSIVE) на час копіювання — запускати у вікно обслуговування.
+    with transaction() as cursor:
+        if is_partitioned(cursor):
+            return None
+        cursor.execute("LOCK TABLE expenses IN ACCESS EXCLUSIVE MODE")
+
+        # Індекси (крім первинного ключа) і тригери відтворюються на новій таблиці
+        cursor.execute("""
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = 'expenses'::regclass AND NOT x.indisprimary
+        """)
+        indexes = cursor.fetchall()
+        cursor.execute("""
+            SELECT pg_get_triggerdef(oid) FROM pg_trigger
+            WHERE tgrelid = 'expenses'::regclass AND NOT tgisinternal
+        """)
+        triggers = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT MIN(date) FROM expenses")
+        first_day = cursor.fetchone()[0] or datetime.date.today()
+
+        cursor.execute("ALTER TABLE expenses RENAME TO expenses_unpartitioned")
+        cursor.execute("ALTER TABLE expenses_unpartitioned RENAME CONSTRAINT expenses_pkey TO expenses_unpartitioned_pkey")
+        for name, _ in indexes:
+            cursor.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                sql.Identifier(name), sql.Identifier(name + "_unpartitioned")))
+
+        cursor.execute("""
+            CREATE TABLE expenses (
+                LIKE expenses_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED
+            ) PARTITION BY RANGE (date)
+        """)
+        # Ключ секціонування має входити до первинного ключа
+        cursor.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY (id, date)")
+        cursor.execute("ALTER TABLE expenses ADD FOREIGN KEY (category_id) REFERENCES categories(id)")
+        cursor.execute(sql.SQL("CREATE TABLE {} PARTITION OF expenses DEFAULT").format(
+            sql.Identifier(DEFAULT_PARTITION)))
+
+        month = month_start(first_day)
+        last = add_months(month_start(datetime.date.today()), months_ahead)
+        partitions = []
+        while month <= last:
+            cursor.execute(sql.SQL("CREATE TABLE {} PARTITION OF expenses FOR VALUES FROM (%s) TO (%s)").format(
+                sql.Identifier(partition_name(month))), (month, add_months(month, 1)))
+            partitions.append(partition_name(month))
+            month = add_months(month, 1)
+
+        # Дані переносяться до створення тригерів: зведення і скетчі вже їх враховують
+        columns = sql.SQL(", ").join(map(sql.Identifier, plain_columns(cursor, "expenses_unpartitioned")))
+        cursor.execute(sql.SQL("INSERT INTO expenses ({columns}) SELECT {columns} FROM expenses_unpartitioned")
+                       .format(columns=columns))
+        moved = cursor.rowcount
+
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for definition in triggers:
+            cursor.execute(definition)
+        cursor.execute("ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id")
+        if not keep_old:
+            cursor.execute("DROP TABLE expenses_unpartitioned")
+        cursor.execute("ANALYZE expenses")
+    return {"partitions": len(partitions), "rows": moved}
+
+
+def archive_partitions(before, directory=ARCHIVE_DIR, keep_table=False):
+    # Від'єднує секції місяців до before (YYYY-MM, не включно), зберігає їх у
+    # archive/<секція>.csv.gz і видаляє. Зведення і скетчі за ці дні також очищаються.
+    limit = datetime.datetime.strptime(before, "%Y-%m").date()
+    os.makedirs(directory, exist_ok=True)
+    archived = []
+    with transaction() as cursor:
+        if not is_partitioned(cursor):
+            return archived
+        for name in list_partitions(cursor):
+            if name == DEFAULT_PARTITION:
+                continue
+            month = datetime.datetime.strptime(name, "expenses_y%Ym%m").date()
+            if add_months(month, 1) > limit:
+                continue
+            cursor.execute(sql.SQL("ALTER TABLE expenses DETACH PARTITION {}").format(sql.Identifier(name)))
+            path = os.path.join(directory, name + ".csv.gz")
+            with gzip.open(path, "wt", encoding="utf-8", newline="") as out:
+                cursor.copy_expert(sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(
+                    sql.Identifier(name)).as_string(cursor), out)
+            if not keep_table:
+                cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+            cursor.execute("DELETE FROM daily_rollup WHERE date >= %s AND date < %s", (month, add_months(month, 1)))
+            cursor.execute("DELETE FROM expense_sketch WHERE month = %s", (month,))
+            archived.append((name, path))
+        if archived:
+            # Дані зникли з expenses поза тригерами батьківської таблиці — скидаємо кеш звітів
+            cursor.execute("UPDATE data_versions SET version = version + 1 WHERE table_name = 'expenses'")
+    return archived
@@ -0,0 +1,279 @@
+import os
+import datetime
+from decimal import ROUND_HALF_UP
+from database import execute_query, fetch_page
+from utils import validate_date
+from cache import reports as report_cache
+from models import CENT
+from partitioning import month_start, add_months
+from sketches import BUCKET_SQL, bucket_value
+
+# Кількість рядків на сторінці у списках і пошуку
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "20"))
+
+# Конфігурація повнотекстового пошуку: 'simple' не залежить від мови (без стемінгу),
+# тож однаково працює для українських і англійських назв
+SEARCH_CONFIG = "simple"
+
+# Генерований tsvector (назва важить більше за опис), GIN-індекс для нього та
+# триграмні індекси для пошуку частини слова через ILIKE
+SEARCH_MIGRATION_SQL = f"""
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    ALTER TABLE expenses ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(description, '')), 'B')
+    ) STORED;
+    CREATE INDEX IF NOT EXISTS idx_expenses_search
+        ON expenses USING GIN (search_vector) WHERE is_deleted = FALSE;
+    CREATE INDEX IF NOT EXISTS idx_expenses_title_trgm
+        ON expenses USING GIN (title gin_trgm_ops) WHERE is_deleted = FALSE;
+    CREATE INDEX IF NOT EXISTS idx_expenses_description_trgm
+        ON expenses USING GIN (description gin_trgm_ops) WHERE is_deleted = FALSE;
+    CREATE INDEX IF NOT EXISTS idx_categories_name_trgm
+        ON categories USING GIN (name gin_trgm_ops);
+"""
+
+# Запити звітів (без виводу на екран): ними користуються і меню, і CLI
+TOTAL_SQL = """
+    SELECT currency, SUM(sum) FROM daily_rollup
+    GROUP BY currency
+"""
+
+TOTALS_BY_CATEGORY_SQL = """
+    SELECT c.name, r.currency, SUM(r.sum)
+    FROM daily_rollup r
+    JOIN categories c ON r.category_id = c.id
+    GROUP BY c.name, r.currency
+    ORDER BY c.name
+"""
+
+MAX_MIN_BY_CATEGORY_SQL = """
+    SELECT c.name, MAX(r.max), MIN(r.min), SUM(r.count)
+    FROM daily_rollup r
+    JOIN categories c ON r.category_id = c.id
+    GROUP BY c.name
+"""
+
+EXTREME_MAX_SQL = """
+    SELECT title, amount, currency, date FROM expenses
+    WHERE is_deleted=FALSE AND date BETWEEN %s AND %s ORDER BY amount DESC LIMIT 1
+"""
+
+EXTREME_MIN_SQL = """
+    SELECT title, amount, currency, date FROM expenses
+    WHERE is_deleted=FALSE AND date BETWEEN %s AND %s ORDER BY amount ASC LIMIT 1
+"""
+
+AVERAGE_DAILY_SQL = """
+    SELECT currency, COALESCE(SUM(sum), 0)
+    FROM daily_rollup
+    WHERE date BETWEEN %s AND %s
+    GROUP BY currency
+"""
+
+TOP_CATEGORY_SQL = """
+    SELECT c.name, SUM(r.sum) as total, r.currency
+    FROM daily_rollup r JOIN categories c ON r.category_id = c.id
+    GROUP BY c.name, r.currency
+    ORDER BY total DESC
+"""
+
+# Квантилі звіту про розподіл сум (медіана, p90, p99)
+DISTRIBUTION_QUANTILES = (0.5, 0.9, 0.99)
+_QUANTILE_COLUMNS = ",\n           ".join(f"MIN(r.bucket) FILTER (WHERE r.running > {q} * (r.total - 1))"
+                                       for q in DISTRIBUTION_QUANTILES)
+
+# Розподіл сум по категоріях і валютах: скетчі повних місяців періоду (expense_sketch)
+# зливаються з кошиками, порахованими по сирих рядках неповних крайніх місяців.
+# Квантиль q — перший кошик, у якому накопичена кількість перевищує q * (n - 1).
+DISTRIBUTION_SQL = f"""
+    WITH buckets AS (
+        SELECT category_id, currency, bucket, SUM(count) AS count
+        FROM (
+            SELECT category_id, currency, bucket, count FROM expense_sketch
+            WHERE month >= %(full_start)s AND month < %(full_end)s
+            UNION ALL
+            SELECT category_id, currency, {BUCKET_SQL}, COUNT(*) FROM expenses
+            WHERE is_deleted = FALSE AND date BETWEEN %(start)s AND %(end)s
+                AND NOT (date >= %(full_start)s AND date < %(full_end)s)
+            GROUP BY 1, 2, 3
+        ) AS parts
+        GROUP BY category_id, currency, bucket
+        HAVING SUM(count) > 0
+    ), ranked AS (
+        SELECT category_id, currency, bucket,
+               SUM(count) OVER (PARTITION BY category_id, currency ORDER BY bucket) AS running,
+               SUM(count) OVER (PARTITION BY category_id, currency) AS total
+        FROM buckets
+    )
+    SELECT c.name, r.currency, MAX(r.total),
+           {_QUANTILE_COLUMNS}
+    FROM ranked r JOIN categories c ON r.category_id = c.id
+    GROUP BY c.name, r.currency
+    ORDER BY c.name, r.currency
+"""
+
+
+@report_cache.cached
+def total():
+    # [(валюта, сума)]
+    return execute_query(TOTAL_SQL, fetch=True)
+
+
+@report_cache.cached
+def totals_by_category():
+    # [(категорія, валюта, сума)]
+    return execute_query(TOTALS_BY_CATEGORY_SQL, fetch=True)
+
+
+@report_cache.cached
+def max_min_by_category():
+    # [(категорія, MAX, MIN, кількість)]
+    return execute_query(MAX_MIN_BY_CATEGORY_SQL, fetch=True)
+
+
+@report_cache.cached
+def extreme_in_period(start, end):
+    # (найдорожча, найдешевша); кожна — (назва, сума, валюта, дата) або None, якщо витрат немає.
+    # fetch=True, а не fetch_one: порожній список відрізняється від None при помилці БД,
+    # яку кеш звітів не зберігає
+    max_rows = execute_query(EXTREME_MAX_SQL, (start, end), fetch=True)
+    min_rows = execute_query(EXTREME_MIN_SQL, (start, end), fetch=True)
+    if max_rows is None or min_rows is None:
+        return None
+    return (max_rows[0] if max_rows else None), (min_rows[0] if min_rows else None)
+
+
+def days_in_period(start, end):
+    d1 = datetime.datetime.strptime(start, "%Y-%m-%d")
+    d2 = datetime.datetime.strptime(end, "%Y-%m-%d")
+    return (d2 - d1).days + 1
+
+
+@report_cache.cached
+def average_daily(start, end):
+    # [(валюта, сума за період, середнє на день)]; суми групуються окремо для кожної валюти
+    results = execute_query(AVERAGE_DAILY_SQL, (start, end), fetch=True)
+    if results is None:
+        return None
+    return average_rows(results, days_in_period(start, end))
+
+
+def average_rows(results, days_count):
+    # Середнє лишається Decimal (округлене до копійки), без переходу через float
+    return [(curr, total_in_curr, (total_in_curr / days_count).quantize(CENT, rounding=ROUND_HALF_UP))
+            for curr, total_in_curr in results]
+
+
+@report_cache.cached
+def top_category():
+    # [(валюта, категорія, сума)] — лідер для кожної валюти
+    results = execute_query(TOP_CATEGORY_SQL, fetch=True)
+    if results is None:
+        return None
+    return category_leaders(results)
+
+
+def category_leaders(results):
+    # Рядки TOP_CATEGORY_SQL відсортовані за сумою, тож перший для валюти — лідер
+    leaders = []
+    seen_currencies = set()
+    for name, total_amount, currency in results:
+        if currency not in seen_currencies:
+            leaders.append((currency, name, total_amount))
+            seen_currencies.add(currency)
+    return leaders
+
+
+def distribution_params(start=None, end=None):
+    # Параметри DISTRIBUTION_SQL: повні місяці періоду [full_start, full_end) беруться зі
+    # скетчів, решта днів — з expenses. Без періоду — усі скетчі й жодного сирого рядка.
+    if start is None and end is None:
+        return {"start": None, "end": None, "full_start": "-infinity", "full_end": "infinity"}
+    first = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    full_start = first if first.day == 1 else add_months(month_start(first), 1)
+    full_end = month_start(last + datetime.timedelta(days=1))
+    if full_start >= full_end:
+        full_start = full_end = first
+    return {"start": first, "end": last, "full_start": full_start, "full_end": full_end}
+
+
+def distribution_rows(results):
+    # Номери кошиків -> оцінки сум: (категорія, валюта, кількість, p50, p90, p99)
+    return [(name, currency, count) + tuple(bucket_value(bucket) for bucket in buckets)
+            for name, currency, count, *buckets in results]
+
+
+@report_cache.cached
+def distribution(start=None, end=None):
+    # Медіана, p90 і p99 сум по категоріях і валютах за період (або за весь час)
+    results = execute_query(DISTRIBUTION_SQL, distribution_params(start, end), fetch=True)
+    if results is None:
+        return None
+    return distribution_rows(results)
+
+
+EXPENSES_PAGE_SQL = """
+    SELECT e.id, e.title, e.date, c.name, e.amount, e.currency
+    FROM expenses e JOIN categories c ON e.category_id = c.id
+    WHERE e.is_deleted=FALSE
+"""
+
+
+def search_key(text):
+    # Ключ keyset-пагінації для рядка пошуку: (-релевантність, id) або (дата, id)
+    if text:
+        return lambda row: (row[7], row[0])
+    return lambda row: (row[2], row[0])
+
+
+def build_search_query(text="", cat_name="", start_date="", end_date="", amount_sql="e.amount"):
+    # (запит, параметри, ключі сторінки) для пошуку. З текстом — повнотекстовий пошук за назвою
+    # й описом, відсортований за релевантністю (keyset за (-rank, id)); без тексту — за (date, id).
+    # amount_sql — вираз стовпця суми (repository вибирає одразу копійки)
+    filters = ""
+    params = []
+    if cat_name:
+        filters += " AND c.name ILIKE %s"
+        params.append(f"%{cat_name}%")
+    if start_date and validate_date(start_date):
+        filters += " AND e.date >= %s"
+        params.append(start_date)
+    if end_date and validate_date(end_date):
+        filters += " AND e.date <= %s"
+        params.append(end_date)
+
+    if not text:
+        query = f"""
+            SELECT e.id, e.title, e.date, c.name, {amount_sql}, e.currency, e.description
+            FROM expenses e
+            JOIN categories c ON e.category_id = c.id
+            WHERE e.is_deleted = FALSE
+        """ + filters
+        return query, params, ["e.date", "e.id"]
+
+    # Слова шукаються через GIN-індекс по search_vector, частини слів — через
+    # триграмні індекси; ранг приводиться до float8, щоб ключ сторінки точно повторювався
+    pattern = f"%{text}%"
+    query = f"""
+        SELECT * FROM (
+            SELECT e.id, e.title, e.date, c.name, {amount_sql} AS amount, e.currency, e.description,
+                   -(ts_rank(e.search_vector, q) + similarity(e.title, %s))::float8 AS neg_rank
+            FROM expenses e
+            JOIN categories c ON e.category_id = c.id
+            CROSS JOIN websearch_to_tsquery('{SEARCH_CONFIG}', %s) q
+            WHERE e.is_deleted = FALSE
+                AND (e.search_vector @@ q OR e.title ILIKE %s OR e.description ILIKE %s)
+                {filters}
+        ) s
+        WHERE TRUE
+    """
+    return query, [text, text, pattern, pattern] + params, ["s.neg_rank", "s.id"]
+
+
+def fetch_search_page(text="", cat_name="", start_date="", end_date="",
+                      after=None, before=None, size=PAGE_SIZE, amount_sql="e.amount"):
+    # Сторінка результатів пошуку з keyset-пагінацією
+    query, params, keys = build_search_query(text, cat_name, start_date, end_date, amount_sql)
+    return fetch_page(query, params, keys, after, before, size)
@@ -0,0 +1,55 @@
+from database import execute_query, fetch_page
+from models import Expense, Category
+import reports
+
+# Доступ до витрат і категорій у вигляді об'єктів models. Сума вибирається одразу
+# в копійках (bigint), тож psycopg2 не створює Decimal для кожного рядка.
+EXPENSE_CENTS_SQL = "(e.amount * 100)::bigint"
+EXPENSE_COLUMNS_SQL = f"""
+    e.id, e.title, e.date, e.category_id, c.name, {EXPENSE_CENTS_SQL}, e.currency, e.description
+"""
+# Список і деталі показують лише витрати з категорією, як і раніше
+EXPENSES_FROM_SQL = """
+    FROM expenses e JOIN categories c ON e.category_id = c.id
+    WHERE e.is_deleted = FALSE
+"""
+# Редагування знаходить будь-яку активну витрату, зокрема без категорії
+ANY_EXPENSE_FROM_SQL = """
+    FROM expenses e LEFT JOIN categories c ON e.category_id = c.id
+    WHERE e.is_deleted = FALSE
+"""
+
+
+def iter_categories():
+    rows = execute_query("SELECT id, name FROM categories WHERE is_deleted=FALSE ORDER BY id",
+                         fetch=True, prepared=True)
+    return map(Category.from_row, rows or [])
+
+
+def get_expense(exp_id, any_category=False):
+    # Expense або None, якщо витрати немає чи її видалено.
+    # any_category=True — для редагування: знаходить і витрату без категорії
+    from_sql = ANY_EXPENSE_FROM_SQL if any_category else EXPENSES_FROM_SQL
+    row = execute_query(f"SELECT {EXPENSE_COLUMNS_SQL} {from_sql} AND e.id=%s",
+                        (exp_id,), fetch_one=True, prepared=True)
+    return Expense.from_row(row) if row else None
+
+
+def expenses_page(after=None, before=None, size=reports.PAGE_SIZE):
+    # Сторінка витрат (keyset за id): (ітератор Expense, чи є ще). Об'єкти створюються
+    # ліниво, по одному під час обходу, як і в iter_categories
+    rows, has_more = fetch_page(f"SELECT {EXPENSE_COLUMNS_SQL} {EXPENSES_FROM_SQL}", (), ["e.id"],
+                                after, before, size)
+    return (None if rows is None else map(Expense.from_row, rows)), has_more
+
+
+def search_page(text="", cat_name="", start_date="", end_date="", after=None, before=None,
+                size=reports.PAGE_SIZE):
+    # Сторінка пошуку: (ітератор (Expense, ключ сторінки), чи є ще). Ключ залежить від режиму
+    # пошуку (релевантність або дата), тому повертається поруч з об'єктом
+    rows, has_more = reports.fetch_search_page(text, cat_name, start_date, end_date, after, before, size,
+                                               amount_sql=EXPENSE_CENTS_SQL)
+    if rows is None:
+        return None, has_more
+    key = reports.search_key(text)
+    return ((Expense(r[0], r[1], r[2], None, r[3], r[4], r[5], r[6]), key(r)) for r in rows), has_more
@@ -0,0 +1,136 @@
+from database import connection
+
+# Агрегація активних витрат у розрізі (день, категорія, валюта)
+AGGREGATE_SQL = """
+    INSERT INTO daily_rollup (date, category_id, currency, sum, count, min, max)
+    SELECT date, category_id, currency, SUM(amount), COUNT(*), MIN(amount), MAX(amount)
+    FROM expenses
+    WHERE is_deleted = FALSE
+    GROUP BY date, category_id, currency
+"""
+
+# Ключ групи; NULL у category_id/currency приводиться до значень за замовчуванням,
+# щоб рядки без валюти (як у сидах) потрапляли в унікальний індекс
+ROLLUP_KEY = "date, (COALESCE(category_id, 0)), (COALESCE(currency, ''))"
+
+# Вираз для з'єднання daily_rollup (r) з ключами (k), що використовує унікальний індекс
+_KEY_MATCH = """r.date = k.date
+        AND COALESCE(r.category_id, 0) = COALESCE(k.category_id, 0)
+        AND COALESCE(r.currency, '') = COALESCE(k.currency, '')"""
+
+
+def _lock_sql(keys):
+    # Транзакційні advisory-блокування на кожну групу в порядку ключа блокування:
+    # записи в одну групу виконуються по черзі (до COMMIT попереднього), а однаковий
+    # порядок захоплення не дає паралельним масовим операціям потрапити в deadlock
+    return f"""
+        PERFORM pg_advisory_xact_lock(lock_key)
+        FROM (
+            SELECT DISTINCT hashtextextended(concat_ws('|', date, COALESCE(category_id, 0),
+                                                      COALESCE(currency, '')), 0) AS lock_key
+            FROM ({keys}) AS k
+            ORDER BY lock_key
+        ) AS locks;
+    """
+
+
+def _recompute_sql(keys):
+    # Перерахунок лише тих груп, яких торкнувся оператор: після UPDATE/DELETE
+    # MIN/MAX не можна "відняти", тому групу краще порахувати заново. Кожен оператор
+    # PL/pgSQL бере новий знімок, тож після блокування видно зміни, закомічені
+    # попереднім записувачем цієї групи; групи без активних витрат просто не вставляються
+    return f"""
+        {_lock_sql(keys)}
+        WITH k AS ({keys})
+        DELETE FROM daily_rollup r USING k WHERE {_KEY_MATCH};
+        WITH k AS ({keys})
+        INSERT INTO daily_rollup (date, category_id, currency, sum, count, min, max)
+        SELECT e.date, e.category_id, e.currency, SUM(e.amount), COUNT(*), MIN(e.amount), MAX(e.amount)
+        FROM expenses e
+        JOIN k ON e.date = k.date
+            AND COALESCE(e.category_id, 0) = COALESCE(k.category_id, 0)
+            AND COALESCE(e.currency, '') = COALESCE(k.currency, '')
+        WHERE e.is_deleted = FALSE
+        GROUP BY e.date, e.category_id, e.currency;
+    """
+
+
+_OLD_KEYS = "SELECT DISTINCT date, category_id, currency FROM old_rows WHERE is_deleted = FALSE"
+_NEW_KEYS = "SELECT DISTINCT date, category_id, currency FROM new_rows WHERE is_deleted = FALSE"
+
+# Функції тригерів окремо від таблиці: їх оновлює і пізніша міграція
+FUNCTIONS_SQL = f"""
+    CREATE OR REPLACE FUNCTION daily_rollup_insert() RETURNS trigger AS $$
+    BEGIN
+        {_lock_sql(_NEW_KEYS)}
+        INSERT INTO daily_rollup AS r (date, category_id, currency, sum, count, min, max)
+        SELECT date, category_id, currency, SUM(amount), COUNT(*), MIN(amount), MAX(amount)
+        FROM new_rows
+        WHERE is_deleted = FALSE
+        GROUP BY date, category_id, currency
+        ON CONFLICT ({ROLLUP_KEY}) DO UPDATE
+        SET sum = r.sum + EXCLUDED.sum,
+            count = r.count + EXCLUDED.count,
+            min = LEAST(r.min, EXCLUDED.min),
+            max = GREATEST(r.max, EXCLUDED.max);
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION daily_rollup_update() RETURNS trigger AS $$
+    BEGIN
+        {_recompute_sql(_OLD_KEYS + " UNION " + _NEW_KEYS)}
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION daily_rollup_delete() RETURNS trigger AS $$
+    BEGIN
+        {_recompute_sql(_OLD_KEYS)}
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+"""
+
+# Таблиця і тригери рівня оператора (з transition tables), тож COPY та масові
+# INSERT оновлюють зведення одним запитом, а не на кожен рядок
+MIGRATION_SQL = f"""
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        date DATE NOT NULL,
+        category_id INTEGER,
+        currency CHAR(3),
+        sum DECIMAL(14,2) NOT NULL,
+        count INTEGER NOT NULL,
+        min DECIMAL(10,2) NOT NULL,
+        max DECIMAL(10,2) NOT NULL
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_rollup_key ON daily_rollup ({ROLLUP_KEY});
+
+    {FUNCTIONS_SQL}
+    DROP TRIGGER IF EXISTS trg_daily_rollup_insert ON expenses;
+    CREATE TRIGGER trg_daily_rollup_insert AFTER INSERT ON expenses
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION daily_rollup_insert();
+    DROP TRIGGER IF EXISTS trg_daily_rollup_update ON expenses;
+    CREATE TRIGGER trg_daily_rollup_update AFTER UPDATE ON expenses
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION daily_rollup_update();
+    DROP TRIGGER IF EXISTS trg_daily_rollup_delete ON expenses;
+    CREATE TRIGGER trg_daily_rollup_delete AFTER DELETE ON expenses
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION daily_rollup_delete();
+
+    TRUNCATE daily_rollup;
+    {AGGREGATE_SQL};
+"""
+
+
+def rebuild_rollup():
+    # Повний перерахунок зведення з нуля; записи у expenses на цей час блокуються
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE expenses IN SHARE MODE")
+            cursor.execute("TRUNCATE daily_rollup")
+            cursor.execute(AGGREGATE_SQL)
+            rows = cursor.rowcount
+            # TRUNCATE daily_rollup не проходить через тригери data_versions — скидаємо кеш звітів тут же
+            cursor.execute("UPDATE data_versions SET version = version + 1 WHERE table_name = 'expenses'")
+        conn.commit()
+    return rows
@@ -0,0 +1,638 @@
+import os
+import re
+import json
+import math
+import time
+import asyncio
+import hashlib
+import argparse
+import contextvars
+from decimal import Decimal, InvalidOperation
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+import psycopg2
+from psycopg2 import errors, extensions
+from database import DB_CONFIG, POOL_CONFIG, DELETE_CATEGORY_SQL, build_page_query, finish_page
+from instrumentation import Timer, record_query
+from cache import REPORT_CACHE_SIZE
+from utils import validate_date, validate_amount, validate_id
+from models import CENT, MAX_AMOUNT
+import reports
+
+# HTTP/JSON-сервіс на asyncio без сторонніх фреймворків: один процес обслуговує багато
+# клієнтів, бо очікування відповіді PostgreSQL не блокує цикл подій.
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+    404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+# Сумарний час запитів до БД у межах поточного HTTP-запиту (для журналу)
+_db_ms = contextvars.ContextVar("db_ms", default=None)
+
+
+async def _wait(conn):
+    # Чекає завершення операції асинхронного з'єднання psycopg2 через add_reader/add_writer
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            add, remove = loop.add_reader, loop.remove_reader
+        elif state == extensions.POLL_WRITE:
+            add, remove = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"Неочікуваний стан poll(): {state}")
+        ready = loop.create_future()
+        fd = conn.fileno()
+        add(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            remove(fd)
+
+
+class AsyncPool:
+    # Пул асинхронних з'єднань (async_=1). Такі з'єднання працюють в autocommit,
+    # тож кожна операція сервісу — один SQL-оператор
+    def __init__(self, dsn, max_size=10):
+        self.dsn = dsn
+        self.max_size = max_size
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_size)
+        self.stats = {"checkouts": 0, "waits": 0, "connects": 0}
+
+    async def _connect(self):
+        conn = psycopg2.connect(async_=1, **self.dsn)
+        await _wait(conn)
+        self.stats["connects"] += 1
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._slots.locked():
+            self.stats["waits"] += 1
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            self.stats["checkouts"] += 1
+            try:
+                yield conn
+            except BaseException:
+                # Після помилки чи скасування запиту (CancelledError, відключення клієнта) на
+                # з'єднанні може лишитися незавершена команда — у пул його не повертаємо
+                conn.close()
+                raise
+            if not conn.closed:
+                self._idle.append(conn)
+
+    async def query(self, sql, params=None, one=False):
+        # Рядки SELECT/RETURNING (або один рядок при one=True), для інших операторів — rowcount
+        timer = Timer()
+        async with self.connection() as conn:
+            acquire_ms = timer.lap()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                await _wait(conn)
+            except Exception as e:
+                record_query(sql, acquire_ms, timer.lap(), None, error=e)
+                raise
+            if cursor.description is None:
+                result = rows = cursor.rowcount
+            elif one:
+                result = cursor.fetchone()
+                rows = int(result is not None)
+            else:
+                result = cursor.fetchall()
+                rows = len(result)
+            execute_ms = timer.lap()
+            record_query(sql, acquire_ms, execute_ms, rows)
+        spent = _db_ms.get()
+        if spent is not None:
+            spent[0] += acquire_ms + execute_ms
+        return result
+
+    def closeall(self):
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+    def status(self):
+        return dict(self.stats, idle=len(self._idle), max_size=self.max_size)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+        self.args = ()
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Тіло запиту має бути JSON.")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Тіло запиту має бути JSON-об'єктом.")
+        return data
+
+
+def _json_default(value):
+    # Decimal і дати — рядками, щоб не втратити точність сум
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Не вдається серіалізувати {type(value).__name__}")
+
+
+def _records(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _page_size(request):
+    size = request.query.get("size", str(reports.PAGE_SIZE))
+    if not validate_id(size):
+        raise HTTPError(400, "size має бути додатним числом.")
+    return min(int(size), 500)
+
+
+def _cursor_part_valid(key, value):
+    # Тип частини курсора визначається стовпцем ключа: id, дата або ранг (float)
+    column = key.rsplit(".", 1)[-1]
+    if column == "id":
+        return validate_id(value)
+    if column == "date":
+        return validate_date(value)
+    try:
+        return math.isfinite(float(value))
+    except ValueError:
+        return False
+
+
+def _page_cursor(request, name, keys):
+    # Курсор сторінки: значення ключа через кому (id або дата,id або ранг,id)
+    value = request.query.get(name)
+    if not value:
+        return None
+    parts = value.split(",")
+    if len(parts) != len(keys) or not all(map(_cursor_part_valid, keys, parts)):
+        raise HTTPError(400, f"Некоректний курсор сторінки {name}.")
+    return parts
+
+
+async def _page(request, query, params, keys, key, columns):
+    after, before = _page_cursor(request, "after", keys), _page_cursor(request, "before", keys)
+    size = _page_size(request)
+    sql, sql_params = build_page_query(query, params, keys, after, before, size)
+    rows, has_more = finish_page(await request.pool.query(sql, sql_params), before, size)
+
+    def cursor(row):
+        return ",".join(map(str, key(row)))
+
+    return 200, {
+        "items": _records(columns, rows),
+        "has_more": has_more,
+        "next": cursor(rows[-1]) if rows else None,
+        "prev": cursor(rows[0]) if rows else None,
+    }
+
+
+# --- Категорії ---
+
+async def list_categories(request):
+    rows = await request.pool.query("SELECT id, name FROM categories WHERE is_deleted=FALSE ORDER BY id")
+    return 200, _records(["id", "name"], rows)
+
+
+def _category_name(request):
+    name = str(request.json().get("name") or "").strip()
+    if not name:
+        raise HTTPError(400, "Назва не може бути порожньою.")
+    return name
+
+
+async def create_category(request):
+    try:
+        row = await request.pool.query("INSERT INTO categories (name) VALUES (%s) RETURNING id",
+                                       (_category_name(request),), one=True)
+    except errors.UniqueViolation:
+        raise HTTPError(409, "Категорія з такою назвою вже існує.")
+    return 201, {"id": row[0]}
+
+
+async def update_category(request):
+    try:
+        updated = await request.pool.query("UPDATE categories SET name=%s WHERE id=%s AND is_deleted=FALSE",
+                                           (_category_name(request), request.args[0]))
+    except errors.UniqueViolation:
+        raise HTTPError(409, "Категорія з такою назвою вже існує.")
+    if not updated:
+        raise HTTPError(404, "Категорію не знайдено.")
+    return 200, {"id": int(request.args[0])}
+
+
+async def delete_category(request):
+    has_expenses, deleted = await request.pool.query(DELETE_CATEGORY_SQL, (request.args[0],), one=True)
+    if has_expenses:
+        raise HTTPError(409, "Не можна видалити категорію, поки в ній є активні витрати.")
+    if not deleted:
+        raise HTTPError(404, "Категорію не знайдено.")
+    return 204, None
+
+
+# --- Витрати ---
+
+EXPENSE_FIELDS = ["id", "title", "date", "category", "amount", "currency", "description"]
+
+
+def _expense_values(data, partial=False):
+    # Перевіряє поля витрати з JSON; при partial — лише передані
+    values = {}
+    if "title" in data or not partial:
+        title = str(data.get("title") or "").strip()
+        if not title:
+            raise HTTPError(400, "Назва не може бути порожньою.")
+        values["title"] = title
+    if "date" in data or not partial:
+        if not validate_date(str(data.get("date"))):
+            raise HTTPError(400, "Дата має бути у форматі YYYY-MM-DD.")
+        values["date"] = data["date"]
+    if "amount" in data or not partial:
+        # bool — підклас int, тож true інакше пройшов би як сума 1
+        amount = data.get("amount")
+        if isinstance(amount, bool) or not validate_amount(amount):
+            raise HTTPError(400, "Сума має бути додатним числом.")
+        # Те саме правило, що й в importer.validate_row: сума має вміщатися в DECIMAL(10,2) без округлення
+        try:
+            value = Decimal(str(amount))
+            if value > MAX_AMOUNT or value.quantize(CENT) != value:
+                raise InvalidOperation
+        except InvalidOperation:
+            raise HTTPError(400, f"Сума має бути не більшою за {MAX_AMOUNT} і мати не більше двох знаків після коми.")
+        values["amount"] = str(value)
+    if "category_id" in data or not partial:
+        if isinstance(data.get("category_id"), bool) or not validate_id(data.get("category_id")):
+            raise HTTPError(400, "Некоректний ID категорії.")
+        values["category_id"] = int(data["category_id"])
+    if "description" in data:
+        values["description"] = (str(data["description"]).strip() or None) if data["description"] else None
+    if "currency" in data or not partial:
+        currency = str(data.get("currency") or "UAH").strip().upper()
+        if not re.fullmatch(r"[A-Z]{3}", currency):
+            raise HTTPError(400, "Валюта — три латинські літери.")
+        values["currency"] = currency
+    return values
+
+
+async def list_expenses(request):
+    return await _page(request, reports.EXPENSES_PAGE_SQL, (), ["e.id"], lambda r: (r[0],),
+                       EXPENSE_FIELDS[:6])
+
+
+async def get_expense(request):
+    row = await request.pool.query("""
+        SELECT e.id, e.title, e.date, c.name, e.amount, e.currency, e.description
+        FROM expenses e JOIN categories c ON e.category_id = c.id
+        WHERE e.id=%s AND e.is_deleted=FALSE
+    """, (request.args[0],), one=True)
+    if not row:
+        raise HTTPError(404, "Витрату не знайдено.")
+    return 200, dict(zip(EXPENSE_FIELDS, row))
+
+
+async def create_expense(request):
+    values = _expense_values(request.json())
+    values.setdefault("description", None)
+    # Категорія перевіряється в тому ж операторі, що й вставка
+    row = await request.pool.query("""
+        INSERT INTO expenses (title, date, category_id, amount, description, currency)
+        SELECT %(title)s, %(date)s, %(category_id)s, %(amount)s, %(description)s, %(currency)s
+        WHERE EXISTS (SELECT 1 FROM categories WHERE id=%(category_id)s AND is_deleted=FALSE)
+        RETURNING id
+    """, values, one=True)
+    if not row:
+        raise HTTPError(400, "Категорія не існує.")
+    return 201, {"id": row[0]}
+
+
+async def update_expense(request):
+    values = _expense_values(request.json(), partial=True)
+    if not values:
+        raise HTTPError(400, "Немає полів для оновлення.")
+    assignments = ", ".join(f"{column}=%({column})s" for column in values)
+    # Як і при створенні, категорія перевіряється в тому ж операторі, що й оновлення
+    category_check = ("AND EXISTS (SELECT 1 FROM categories WHERE id=%(category_id)s AND is_deleted=FALSE)"
+                      if "category_id" in values else "")
+    values["id"] = request.args[0]
+    updated = await request.pool.query(
+        f"UPDATE expenses SET {assignments} WHERE id=%(id)s AND is_deleted=FALSE {category_check}", values)
+    if not updated:
+        # Рядок не оновлено: або немає витрати, або категорії — лише вибір тексту помилки
+        if category_check and await request.pool.query(
+                "SELECT 1 FROM expenses WHERE id=%s AND is_deleted=FALSE", (request.args[0],), one=True):
+            raise HTTPError(400, "Категорія не існує.")
+        raise HTTPError(404, "Витрату не знайдено.")
+    return 200, {"id": int(request.args[0])}
+
+
+async def delete_expense(request):
+    deleted = await request.pool.query("UPDATE expenses SET is_deleted=TRUE WHERE id=%s AND is_deleted=FALSE",
+                                       (request.args[0],))
+    if not deleted:
+        raise HTTPError(404, "Витрату не знайдено.")
+    return 204, None
+
+
+async def search(request):
+    q = request.query
+    for name in ("from", "to"):
+        if q.get(name) and not validate_date(q[name]):
+            raise HTTPError(400, f"{name} має бути у форматі YYYY-MM-DD.")
+    text = q.get("text", "").strip()
+    query, params, keys = reports.build_search_query(text, q.get("category", ""), q.get("from", ""),
+                                                     q.get("to", ""))
+    key = (lambda r: (repr(r[7]), r[0])) if text else (lambda r: (r[2], r[0]))
+    columns = EXPENSE_FIELDS + ["neg_rank"] if text else EXPENSE_FIELDS
+    status, body = await _page(request, query, params, keys, key, columns)
+    for item in body["items"]:
+        if "neg_rank" in item:
+            item["rank"] = -item.pop("neg_rank")
+    return status, body
+
+
+# --- Звіти ---
+
+def _period(request):
+    start, end = request.query.get("from"), request.query.get("to")
+    if not (start and end and validate_date(start) and validate_date(end)):
+        raise HTTPError(400, "Потрібні параметри from і to у форматі YYYY-MM-DD.")
+    if reports.days_in_period(start, end) <= 0:
+        raise HTTPError(400, "Кінцева дата має бути не раніше за початкову.")
+    return start, end
+
+
+async def _report_total(request, pool):
+    return _records(["currency", "total"], await pool.query(reports.TOTAL_SQL))
+
+
+async def _report_by_category(request, pool):
+    return _records(["category", "currency", "total"], await pool.query(reports.TOTALS_BY_CATEGORY_SQL))
+
+
+async def _report_max_min(request, pool):
+    return _records(["category", "max", "min", "count"], await pool.query(reports.MAX_MIN_BY_CATEGORY_SQL))
+
+
+async def _report_extreme(request, pool):
+    period = _period(request)
+    # Два незалежні запити паралельно на різних з'єднаннях
+    max_exp, min_exp = await asyncio.gather(pool.query(reports.EXTREME_MAX_SQL, period, one=True),
+                                            pool.query(reports.EXTREME_MIN_SQL, period, one=True))
+    columns = ["title", "amount", "currency", "date"]
+    return {"max": dict(zip(columns, max_exp)) if max_exp else None,
+            "min": dict(zip(columns, min_exp)) if min_exp else None}
+
+
+async def _report_avg_daily(request, pool):
+    start, end = _period(request)
+    rows = reports.average_rows(await pool.query(reports.AVERAGE_DAILY_SQL, (start, end)),
+                                reports.days_in_period(start, end))
+    return [{"currency": curr, "total": total, "average_daily": avg} for curr, total, avg in rows]
+
+
+async def _report_top(request, pool):
+    rows = reports.category_leaders(await pool.query(reports.TOP_CATEGORY_SQL))
+    return _records(["currency", "category", "total"], rows)
+
+
+async def _report_distribution(request, pool):
+    # Без from/to — розподіл за весь час
+    period = _period(request) if request.query.get("from") or request.query.get("to") else (None, None)
+    rows = await pool.query(reports.DISTRIBUTION_SQL, reports.distribution_params(*period))
+    return _records(["category", "currency", "count", "p50", "p90", "p99"], reports.distribution_rows(rows))
+
+
+REPORTS = {
+    "total": (_report_total, ()),
+    "by-category": (_report_by_category, ()),
+    "max-min": (_report_max_min, ()),
+    "extreme": (_report_extreme, ("from", "to")),
+    "avg-daily": (_report_avg_daily, ("from", "to")),
+    "top": (_report_top, ()),
+    "distribution": (_report_distribution, ("from", "to")),
+}
+
+
+class ReportResponses:
+    # ETag звіту — хеш від назви, параметрів і версій даних (data_versions), тож
+    # перевірка If-None-Match і повторний звіт на незмінених даних коштують один запит версій
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._bodies = OrderedDict()
+
+    async def respond(self, request, name):
+        compute, param_names = REPORTS[name]
+        key = (name,) + tuple(request.query.get(p) for p in param_names)
+        versions = tuple(await request.pool.query(
+            "SELECT table_name, version FROM data_versions ORDER BY table_name"))
+        etag = '"' + hashlib.sha1(repr((key, versions)).encode()).hexdigest()[:20] + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return 304, None, headers
+        cached = self._bodies.get(key)
+        if cached is not None and cached[0] == etag:
+            self._bodies.move_to_end(key)
+            return 200, cached[1], headers
+        body = await compute(request, request.pool)
+        if self.max_size:
+            self._bodies[key] = (etag, body)
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_size:
+                self._bodies.popitem(last=False)
+        return 200, body, headers
+
+
+_report_responses = ReportResponses(REPORT_CACHE_SIZE)
+
+
+async def report(request):
+    name = request.args[0]
+    if name not in REPORTS:
+        raise HTTPError(404, "Невідомий звіт.")
+    return await _report_responses.respond(request, name)
+
+
+async def stats(request):
+    return 200, {"pool": request.pool.status()}
+
+
+ROUTES = [
+    ("GET", r"/categories", list_categories),
+    ("POST", r"/categories", create_category),
+    ("PUT", r"/categories/(\d+)", update_category),
+    ("DELETE", r"/categories/(\d+)", delete_category),
+    ("GET", r"/expenses", list_expenses),
+    ("POST", r"/expenses", create_expense),
+    ("GET", r"/expenses/(\d+)", get_expense),
+    ("PUT", r"/expenses/(\d+)", update_expense),
+    ("DELETE", r"/expenses/(\d+)", delete_expense),
+    ("GET", r"/search", search),
+    ("GET", r"/reports/([\w-]+)", report),
+    ("GET", r"/stats", stats),
+]
+ROUTES = [(method, re.compile(pattern + "/?"), handler) for method, pattern, handler in ROUTES]
+
+
+async def dispatch(request):
+    # Повертає (статус, тіло, додаткові заголовки)
+    allowed = False
+    for method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(request.path)
+        if not match:
+            continue
+        allowed = True
+        if method != request.method:
+            continue
+        request.args = match.groups()
+        try:
+            result = await handler(request)
+        except HTTPError as e:
+            return e.status, {"error": e.message}, {}
+        except psycopg2.OperationalError as e:
+            print("\n[Помилка БД]:", e)
+            return 503, {"error": "База даних недоступна."}, {}
+        except psycopg2.Error as e:
+            print("\n[Помилка БД]:", e)
+            return 500, {"error": "Помилка бази даних."}, {}
+        except Exception as e:
+            print("\n[Помилка сервера]:", repr(e))
+            return 500, {"error": "Внутрішня помилка сервера."}, {}
+        return result if len(result) == 3 else (*result, {})
+    if allowed:
+        return 405, {"error": "Метод не підтримується."}, {}
+    return 404, {"error": "Не знайдено."}, {}
+
+
+def _response(status, body, headers, keep_alive):
+    payload = b"" if body is None else json.dumps(body, ensure_ascii=False, default=_json_default).encode()
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    headers = dict(headers, **{"Connection": "keep-alive" if keep_alive else "close"})
+    if status not in (204, 304):
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        headers["Content-Length"] = str(len(payload))
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (payload if status not in (204, 304) else b"")
+
+
+async def _read_request(reader):
+    # Рядок запиту й заголовки HTTP/1.1; None — клієнт закрив з'єднання
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Некоректний рядок запиту.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = headers.get("content-length") or "0"
+    if not (length.isascii() and length.isdigit()):
+        raise HTTPError(400, "Некоректний Content-Length.")
+    length = int(length)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Завелике тіло запиту.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version, headers, body
+
+
+def make_handler(pool):
+    async def handle_client(reader, writer):
+        # Одне TCP-з'єднання може нести кілька запитів поспіль (keep-alive)
+        try:
+            while True:
+                try:
+                    parsed = await _read_request(reader)
+                except HTTPError as e:
+                    writer.write(_response(e.status, {"error": e.message}, {}, False))
+                    await writer.drain()
+                    break
+                if parsed is None:
+                    break
+                method, target, version, headers, body = parsed
+                started = time.perf_counter()
+                spent = [0.0]
+                token = _db_ms.set(spent)
+                request = Request(method, target, headers, body)
+                request.pool = pool
+                try:
+                    status, payload, extra = await dispatch(request)
+                finally:
+                    _db_ms.reset(token)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, payload, extra, keep_alive))
+                await writer.drain()
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"{method} {target} {status} {elapsed:.1f} мс (БД {spent[0]:.1f} мс)", flush=True)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return handle_client
+
+
+async def serve(host=SERVER_HOST, port=SERVER_PORT, pool_size=POOL_CONFIG["max_size"]):
+    pool = AsyncPool(DB_CONFIG, pool_size)
+    server = await asyncio.start_server(make_handler(pool), host, port)
+    print(f"[СЕРВЕР]: http://{host}:{port} (пул до {pool_size} з'єднань)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pool.closeall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON-сервіс витрат і звітів")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--pool-size", type=int, default=POOL_CONFIG["max_size"])
+    parser.add_argument("--sync", action="store_true", help="перевірити/оновити схему перед стартом")
+    args = parser.parse_args(argv)
+    if args.sync:
+        from migrations import init_db
+        if not init_db():
+            return 2
+    try:
+        asyncio.run(serve(args.host, args.port, args.pool_size))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from database import connection
+from models import CENT
+
+# Квантильні скетчі сум витрат у розрізі (місяць, категорія, валюта), як у DDSketch:
+# сума потрапляє в логарифмічний кошик i = ceil(ln(amount) / ln(gamma)), а скетч — це
+# лише кількості по кошиках. Скетчі різних місяців зливаються додаванням кількостей,
+# тож перцентиль за будь-який період — це сума кількох сотень рядків, а не сортування
+# всіх витрат. Оцінка квантиля має відносну похибку не більше SKETCH_ACCURACY.
+SKETCH_ACCURACY = 0.01
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Номер кошика для суми (amount > 0 гарантує CHECK у таблиці expenses)
+BUCKET_SQL = f"CEIL(LN(amount::float8) / {LOG_GAMMA!r})::int"
+
+# Ключ скетча; NULL у category_id/currency приводиться до значень за замовчуванням, як у daily_rollup
+SKETCH_KEY = "month, (COALESCE(category_id, 0)), (COALESCE(currency, '')), bucket"
+
+AGGREGATE_SQL = f"""
+    INSERT INTO expense_sketch (month, category_id, currency, bucket, count)
+    SELECT date_trunc('month', date)::date, category_id, currency, {BUCKET_SQL}, COUNT(*)
+    FROM expenses
+    WHERE is_deleted = FALSE
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def _apply_sql(deltas):
+    # На відміну від MIN/MAX кількості можна відняти, тому UPDATE/DELETE не потребують
+    # перерахунку групи: старі рядки йдуть з -1, нові з +1. ORDER BY фіксує порядок
+    # блокування рядків скетча, щоб паралельні вставки не потрапляли в deadlock.
+    return f"""
+        INSERT INTO expense_sketch AS s (month, category_id, currency, bucket, count)
+        SELECT date_trunc('month', date)::date, category_id, currency, {BUCKET_SQL}, SUM(delta)
+        FROM ({deltas}) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0
+        ORDER BY 1, COALESCE(category_id, 0), COALESCE(currency, ''), 4
+        ON CONFLICT ({SKETCH_KEY}) DO UPDATE
+        SET count = s.count + EXCLUDED.count;
+        DELETE FROM expense_sketch WHERE count = 0;
+    """
+
+
+_OLD_ROWS = "SELECT date, category_id, currency, amount, -1 AS delta FROM old_rows WHERE is_deleted = FALSE"
+_NEW_ROWS = "SELECT date, category_id, currency, amount, 1 AS delta FROM new_rows WHERE is_deleted = FALSE"
+
+# Таблиця і тригери рівня оператора (з transition tables), так само як для daily_rollup.
+# Частковий індекс за count = 0 дозволяє швидко прибирати кошики, що спорожніли після видалень
+MIGRATION_SQL = f"""
+    CREATE TABLE IF NOT EXISTS expense_sketch (
+        month DATE NOT NULL,
+        category_id INTEGER,
+        currency CHAR(3),
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_expense_sketch_key ON expense_sketch ({SKETCH_KEY});
+    CREATE INDEX IF NOT EXISTS idx_expense_sketch_empty ON expense_sketch (month) WHERE count = 0;
+
+    CREATE OR REPLACE FUNCTION expense_sketch_insert() RETURNS trigger AS $$
+    BEGIN
+        {_apply_sql(_NEW_ROWS)}
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION expense_sketch_update() RETURNS trigger AS $$
+    BEGIN
+        {_apply_sql(_OLD_ROWS + " UNION ALL " + _NEW_ROWS)}
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION expense_sketch_delete() RETURNS trigger AS $$
+    BEGIN
+        {_apply_sql(_OLD_ROWS)}
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_expense_sketch_insert ON expenses;
+    CREATE TRIGGER trg_expense_sketch_insert AFTER INSERT ON expenses
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION expense_sketch_insert();
+    DROP TRIGGER IF EXISTS trg_expense_sketch_update ON expenses;
+    CREATE TRIGGER trg_expense_sketch_update AFTER UPDATE ON expenses
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION expense_sketch_update();
+    DROP TRIGGER IF EXISTS trg_expense_sketch_delete ON expenses;
+    CREATE TRIGGER trg_expense_sketch_delete AFTER DELETE ON expenses
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION expense_sketch_delete();
+
+    TRUNCATE expense_sketch;
+    {AGGREGATE_SQL};
+"""
+
+
+def bucket_value(bucket):
+    # Оцінка суми для кошика (gamma^(i-1), gamma^i]: відносна похибка не перевищує SKETCH_ACCURACY
+    value = 2 * GAMMA ** bucket / (GAMMA + 1)
+    return Decimal(repr(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def rebuild_sketches():
+    # Повний перерахунок скетчів з нуля; записи у expenses на цей час блокуються
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE expenses IN SHARE MODE")
+            cursor.execute("TRUNCATE expense_sketch")
+            cursor.execute(AGGREGATE_SQL)
+            rows = cursor.rowcount
+            # TRUNCATE expense_sketch не проходить через тригери data_versions — скидаємо кеш звітів тут же
+            cursor.execute("UPDATE data_versions SET version = version + 1 WHERE table_name = 'expenses'")
+        conn.commit()
+    return rows
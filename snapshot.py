@@ -0,0 +1,209 @@
+import os
+import json
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from database import connection
+from models import CENT
+
+# Колонковий знімок активних витрат для офлайн-аналітики без звернень до PostgreSQL.
+# Кожен стовпець — окремий файл фіксованої ширини, який читається через np.memmap;
+# категорія та валюта закодовані словниками в meta.json (код 0 — NULL).
+SNAPSHOT_DIR = "snapshot"
+BATCH_SIZE = 50000
+EPOCH = datetime.date(1970, 1, 1)
+
+COLUMNS = {
+    "id": "<i8",
+    "date": "<i4",       # дні від 1970-01-01
+    "amount": "<i8",     # сума в копійках
+    "category": "<i4",   # код у meta["categories"]
+    "currency": "u1",    # код у meta["currencies"]
+    "title_end": "<i8",  # кінець назви у title.bin (початок — кінець попередньої)
+}
+TITLES_FILE = "title.bin"
+META_FILE = "meta.json"
+
+SNAPSHOT_SQL = """
+    SELECT e.id, e.date - DATE '1970-01-01', (e.amount * 100)::bigint, c.name, e.currency, e.title
+    FROM expenses e LEFT JOIN categories c ON e.category_id = c.id
+    WHERE e.is_deleted = FALSE AND e.id > %s
+    ORDER BY e.id
+"""
+
+
+def _column_path(path, column):
+    return os.path.join(path, column + ".col")
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(path, meta):
+    # Метадані пишуться останніми і атомарно: вони визначають, скільки рядків дійсні
+    tmp_path = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+
+def _truncate(path, meta):
+    # Відкидає хвости, дописані перерваним оновленням після останнього запису meta.json
+    for column, dtype in COLUMNS.items():
+        with open(_column_path(path, column), "ab") as f:
+            f.truncate(meta["rows"] * np.dtype(dtype).itemsize)
+    with open(os.path.join(path, TITLES_FILE), "ab") as f:
+        f.truncate(meta["title_bytes"])
+
+
+def refresh(path=SNAPSHOT_DIR, full=False, batch_size=BATCH_SIZE):
+    # Дописує у знімок рядки з id, більшим за останній експортований.
+    # Зміни та видалення старих рядків інкрементально не відстежуються — для них full=True.
+    os.makedirs(path, exist_ok=True)
+    meta = None if full else _read_meta(path)
+    if meta is None:
+        meta = {"version": 1, "rows": 0, "last_id": 0, "title_bytes": 0,
+                "categories": [None], "currencies": [None]}
+    _truncate(path, meta)
+
+    cat_codes = {name: code for code, name in enumerate(meta["categories"])}
+    cur_codes = {name: code for code, name in enumerate(meta["currencies"])}
+    appended = 0
+
+    files = {column: open(_column_path(path, column), "ab") for column in COLUMNS}
+    titles_file = open(os.path.join(path, TITLES_FILE), "ab")
+    try:
+        with connection(readonly=True) as conn:
+            with conn.cursor(name="snapshot_cursor") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(SNAPSHOT_SQL, (meta["last_id"],))
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    ids, days, cents, cats, curs, ends = [], [], [], [], [], []
+                    encoded = []
+                    title_end = meta["title_bytes"]
+                    for exp_id, day, amount, category, currency, title in rows:
+                        if category not in cat_codes:
+                            cat_codes[category] = len(meta["categories"])
+                            meta["categories"].append(category)
+                        if currency not in cur_codes:
+                            cur_codes[currency] = len(meta["currencies"])
+                            meta["currencies"].append(currency)
+                        raw = title.encode("utf-8")
+                        title_end += len(raw)
+                        encoded.append(raw)
+                        ids.append(exp_id)
+                        days.append(day)
+                        cents.append(amount)
+                        cats.append(cat_codes[category])
+                        curs.append(cur_codes[currency])
+                        ends.append(title_end)
+
+                    for column, values in (("id", ids), ("date", days), ("amount", cents),
+                                           ("category", cats), ("currency", curs), ("title_end", ends)):
+                        files[column].write(np.asarray(values, dtype=COLUMNS[column]).tobytes())
+                    titles_file.write(b"".join(encoded))
+
+                    meta["rows"] += len(rows)
+                    meta["last_id"] = ids[-1]
+                    meta["title_bytes"] = title_end
+                    appended += len(rows)
+    finally:
+        for f in files.values():
+            f.close()
+        titles_file.close()
+
+    meta["refreshed_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    _write_meta(path, meta)
+    return appended, meta["rows"]
+
+
+def _to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _to_day(date_str):
+    return (datetime.date.fromisoformat(date_str) - EPOCH).days
+
+
+class Snapshot:
+    # Аналітика над знімком: ті самі результати, що й функції reports, але векторно в numpy
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.meta = _read_meta(path)
+        if self.meta is None:
+            raise FileNotFoundError(f"Знімок у {path} не знайдено, спочатку виконайте refresh.")
+        rows = self.meta["rows"]
+        self.categories = self.meta["categories"]
+        self.currencies = self.meta["currencies"]
+        self.columns = {}
+        for column, dtype in COLUMNS.items():
+            if rows:
+                self.columns[column] = np.memmap(_column_path(path, column), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                self.columns[column] = np.empty(0, dtype=dtype)
+        self.titles = np.memmap(os.path.join(path, TITLES_FILE), dtype="u1", mode="r") \
+            if self.meta["title_bytes"] else np.empty(0, dtype="u1")
+
+    def title(self, index):
+        ends = self.columns["title_end"]
+        start = int(ends[index - 1]) if index else 0
+        return bytes(self.titles[start:int(ends[index])]).decode("utf-8")
+
+    def _sum_by(self, codes, amounts, size):
+        # Точна сума в копійках (int64) для кожного коду словника
+        totals = np.zeros(size, dtype=np.int64)
+        np.add.at(totals, codes, amounts)
+        counts = np.bincount(codes, minlength=size)
+        return totals, counts
+
+    def total(self):
+        # [(валюта, сума)] — як reports.total
+        totals, counts = self._sum_by(self.columns["currency"], self.columns["amount"], len(self.currencies))
+        return [(self.currencies[code], _to_decimal(totals[code])) for code in np.nonzero(counts)[0]]
+
+    def max_min_by_category(self):
+        # [(категорія, MAX, MIN, кількість)] — витрати без категорії не враховуються
+        codes = self.columns["category"]
+        amounts = self.columns["amount"]
+        size = len(self.categories)
+        maxima = np.full(size, np.iinfo(np.int64).min, dtype=np.int64)
+        minima = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+        np.maximum.at(maxima, codes, amounts)
+        np.minimum.at(minima, codes, amounts)
+        counts = np.bincount(codes, minlength=size)
+        return [(self.categories[code], _to_decimal(maxima[code]), _to_decimal(minima[code]), int(counts[code]))
+                for code in np.nonzero(counts)[0] if self.categories[code] is not None]
+
+    def _period_mask(self, start, end):
+        days = self.columns["date"]
+        return (days >= _to_day(start)) & (days <= _to_day(end))
+
+    def _row(self, index):
+        return (self.title(index), _to_decimal(self.columns["amount"][index]),
+                self.currencies[self.columns["currency"][index]],
+                EPOCH + datetime.timedelta(days=int(self.columns["date"][index])))
+
+    def extreme_in_period(self, start, end):
+        # (найдорожча, найдешевша) у форматі reports.extreme_in_period
+        indices = np.nonzero(self._period_mask(start, end))[0]
+        if not len(indices):
+            return None, None
+        amounts = self.columns["amount"][indices]
+        return self._row(indices[np.argmax(amounts)]), self._row(indices[np.argmin(amounts)])
+
+    def average_daily(self, start, end):
+        # [(валюта, сума, середнє на день)] — як reports.average_daily
+        days_count = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days + 1
+        mask = self._period_mask(start, end)
+        totals, counts = self._sum_by(self.columns["currency"][mask], self.columns["amount"][mask],
+                                      len(self.currencies))
+        return [(self.currencies[code], _to_decimal(totals[code]),
+                 (_to_decimal(totals[code]) / days_count).quantize(CENT, rounding=ROUND_HALF_UP))
+                for code in np.nonzero(counts)[0]]